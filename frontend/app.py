@@ -1,11 +1,17 @@
+import asyncio
+import hashlib
+import json
 import os
+import time
+from collections import defaultdict, deque
 from datetime import datetime
 from functools import wraps
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse
+import httpx
 from dotenv import load_dotenv
-from flask import Flask, flash, redirect, render_template, request, session, url_for, jsonify
-from supabase import Client, create_client
+from quart import Quart, flash, g, redirect, render_template, request, session, url_for, jsonify
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
 
 load_dotenv()
 
@@ -17,7 +23,60 @@ ROOMS_TABLE = "rooms"
 BUILDINGS_TABLE = "buildings"
 USERS_TABLE = "users"
 
-def _create_supabase_client() -> Client:
+# Selects con recursos embebidos: PostgREST resuelve las relaciones en una sola petición
+ROOM_WITH_BUILDING_SELECT = "room:rooms!room_id(*, building:buildings!building_id(*))"
+ACCESS_BLOCK_SELECT = f"*, {ROOM_WITH_BUILDING_SELECT}"
+
+# Cache en memoria para datos que cambian poco (opciones de filtro, salones por
+# edificio). Se invalida en cada alta/edición/baja de tarjetas, salones o edificios.
+_options_cache: Dict[str, Tuple[float, Any]] = {}
+_cache_ttl_seconds = 60
+
+
+def _cache_get(key: str) -> Any:
+    entry = _options_cache.get(key)
+    if entry is None or (time.time() - entry[0]) >= _cache_ttl_seconds:
+        return None
+    return entry[1]
+
+
+def _cache_set(key: str, value: Any) -> None:
+    _options_cache[key] = (time.time(), value)
+
+
+# Límite de intentos de login por IP (ventana deslizante en memoria)
+_login_attempts: Dict[str, Deque[float]] = {}
+_login_max_attempts = 5
+_login_window_seconds = 60
+
+
+def _login_rate_limited(client_ip: str) -> bool:
+    """Registra un intento de login y devuelve True si la IP superó el límite."""
+    now = time.monotonic()
+    # Purgar IPs sin intentos recientes para que el diccionario no crezca sin límite
+    for ip in [ip for ip, hits in _login_attempts.items() if now - hits[-1] >= _login_window_seconds]:
+        del _login_attempts[ip]
+
+    attempts = _login_attempts.setdefault(client_ip, deque())
+    while attempts and now - attempts[0] >= _login_window_seconds:
+        attempts.popleft()
+    if len(attempts) >= _login_max_attempts:
+        return True
+    attempts.append(now)
+    return False
+
+
+def _create_http_client() -> httpx.AsyncClient:
+    # Un único pool HTTP/2 con keep-alive compartido por PostgREST y Auth:
+    # evita repetir el handshake TCP+TLS en cada consulta a Supabase.
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+        timeout=httpx.Timeout(10.0),
+    )
+
+
+async def _create_supabase_client(http_client: httpx.AsyncClient) -> AsyncClient:
     url = os.getenv("SUPABASE_URL")
     key = os.getenv("SUPABASE_KEY")
 
@@ -26,16 +85,18 @@ def _create_supabase_client() -> Client:
             "Missing SUPABASE_URL or SUPABASE_KEY environment variables."
         )
 
-    return create_client(url, key)
+    return await acreate_client(
+        url, key, options=AsyncClientOptions(httpx_client=http_client)
+    )
 
 
 def _login_required(view_func):
     @wraps(view_func)
-    def wrapper(*args, **kwargs):
+    async def wrapper(*args, **kwargs):
         if "user" not in session:
-            flash("Por favor inicia sesión para continuar.", "warning")
+            await flash("Por favor inicia sesión para continuar.", "warning")
             return redirect(url_for("login"))
-        return view_func(*args, **kwargs)
+        return await view_func(*args, **kwargs)
 
     return wrapper
 
@@ -57,35 +118,41 @@ def _parse_date_filter(value: str, *, end_of_day: bool = False) -> Optional[str]
         return None
 
 
-def _match_student_filter(card_data: Dict[str, Any], search_term: str) -> bool:
-    """Verifica si una tarjeta RFID coincide con el filtro de búsqueda."""
-    if not search_term:
-        return True
-    
-    search_lower = search_term.lower()
-    
-    # Buscar en nombre, código y UID
-    if card_data.get("person_name"):
-        if search_lower in str(card_data["person_name"]).lower():
-            return True
-    if card_data.get("student_code"):
-        if search_lower in str(card_data["student_code"]).lower():
-            return True
-    if card_data.get("uid"):
-        if search_lower in str(card_data["uid"]).lower():
-            return True
-    
-    return False
+def _quote_filter_value(value: str) -> str:
+    """Escapa un valor para usarlo dentro de un filtro `or` de PostgREST."""
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
 
 
-def _fetch_access_logs(client: Client, filters: Dict[str, Any]) -> Dict[str, Any]:
-    """Obtiene eventos de acceso con relaciones completas."""
+async def _index_by(
+    client: AsyncClient, table: str, column: str, values: Iterable[Any]
+) -> Dict[Any, Dict[str, Any]]:
+    """Obtiene en una sola consulta las filas de `table` cuyo `column` está en `values`."""
+    keys = [v for v in set(values) if v]
+    if not keys:
+        return {}
     try:
-        # Obtener eventos
-        query = (
-            client.table(ACCESS_EVENTS_TABLE)
-            .select("*")
-        )
+        resp = await client.table(table).select("*").in_(column, keys).execute()
+    except Exception:
+        return {}
+    return {row[column]: row for row in resp.data or [] if row.get(column)}
+
+
+async def _fetch_access_logs(client: AsyncClient, filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Obtiene eventos de acceso con sus etiquetas de estudiante, sala y edificio.
+
+    Las etiquetas están copiadas en access_events (ver migración
+    access_events_denormalized_labels), así que no hace falta hacer joins.
+    Todos los filtros se aplican en Postgres antes de paginar, de modo que cada
+    página contiene `limit` eventos que coinciden.
+    """
+    try:
+        search_term = filters.get("student") or ""
+        search_type = filters.get("search_type", "all") if search_term else ""
+
+        # El usuario asignado solo vive en rfid_cards: es el único caso con join
+        columns = "*, rfid_card:rfid_cards!card_uid!inner(user_id)" if search_type == "user" else "*"
+        query = client.table(ACCESS_EVENTS_TABLE).select(columns)
 
         # Filtros
         if filters.get("start_date"):
@@ -93,180 +160,68 @@ def _fetch_access_logs(client: Client, filters: Dict[str, Any]) -> Dict[str, Any
         if filters.get("end_date"):
             query = query.lte("event_time", filters["end_date"])
 
+        pattern = f"%{search_term}%"
+        if search_type == "all":
+            quoted = _quote_filter_value(pattern)
+            query = query.or_(
+                f"person_name.ilike.{quoted},student_code.ilike.{quoted},card_uid.ilike.{quoted}"
+            )
+        elif search_type == "name":
+            query = query.ilike("person_name", pattern)
+        elif search_type == "code":
+            query = query.ilike("student_code", pattern)
+        elif search_type == "uid":
+            query = query.ilike("card_uid", pattern)
+        elif search_type == "user":
+            # Buscar por usuario ACTUALMENTE asignado a la tarjeta (UUID exacto)
+            query = query.eq("rfid_card.user_id", search_term)
+
+        if filters.get("room"):
+            query = query.eq("room_name", filters["room"])
+        if filters.get("building"):
+            query = query.eq("building_name", filters["building"])
+
         limit = filters.get("limit") or 50
         limit = max(1, min(limit, 500))
+        page = max(1, filters.get("page") or 1)
+        offset = (page - 1) * limit
         
-        response = query.order("event_time", desc=True).limit(limit).execute()
+        # Se pide una fila extra solo para saber si existe una página siguiente
+        response = await (
+            query.order("event_time", desc=True)
+            .range(offset, offset + limit)
+            .execute()
+        )
         
         if getattr(response, "error", None):
             raise RuntimeError(response.error)
         
         events = response.data or []
-        
-        # Enriquecer con datos relacionados
-        enriched_events = []
-        for event in events:
-            enriched = dict(event)
-            
-            # Obtener datos de tarjeta RFID
-            if event.get("card_uid"):
-                try:
-                    card_resp = (
-                        client.table(RFID_CARDS_TABLE)
-                        .select("*")
-                        .eq("uid", event["card_uid"])
-                        .limit(1)
-                        .execute()
-                    )
-                    if card_resp.data and len(card_resp.data) > 0:
-                        enriched["rfid_card"] = card_resp.data[0]
-                except Exception as e:
-                    pass
-            
-            # Obtener datos de sala
-            if event.get("room_id"):
-                try:
-                    room_resp = (
-                        client.table(ROOMS_TABLE)
-                        .select("*")
-                        .eq("id", event["room_id"])
-                        .limit(1)
-                        .execute()
-                    )
-                    if room_resp.data and len(room_resp.data) > 0:
-                        room_data = room_resp.data[0]
-                        enriched["room"] = room_data
-                        
-                        # Obtener datos de edificio
-                        if room_data.get("building_id"):
-                            try:
-                                building_resp = (
-                                    client.table(BUILDINGS_TABLE)
-                                    .select("*")
-                                    .eq("id", room_data["building_id"])
-                                    .limit(1)
-                                    .execute()
-                                )
-                                if building_resp.data and len(building_resp.data) > 0:
-                                    enriched["building"] = building_resp.data[0]
-                            except Exception as e:
-                                pass
-                except Exception as e:
-                    pass
-            
-            enriched_events.append(enriched)
-        
-        # Aplicar filtros en memoria
-        filtered_events = enriched_events
-        
-        if filters.get("student"):
-            search_type = filters.get("search_type", "all")
-            
-            # Para búsqueda por usuario, NO hacer lowercase (es un UUID)
-            if search_type == "user":
-                search_term = filters["student"]  # Mantener UUID tal como está
-            else:
-                search_term = filters["student"].lower()  # Para texto, convertir a lowercase
-            
-            if search_type == "all":
-                # Buscar en todo
-                filtered_events = [
-                    e for e in filtered_events
-                    if search_term in str(e.get("rfid_card", {}).get("person_name", "")).lower()
-                    or search_term in str(e.get("rfid_card", {}).get("student_code", "")).lower()
-                    or search_term in str(e.get("card_uid", "")).lower()
-                ]
-            elif search_type == "name":
-                # Buscar solo en nombre de la tarjeta
-                filtered_events = [
-                    e for e in filtered_events
-                    if search_term in str(e.get("rfid_card", {}).get("person_name", "")).lower()
-                ]
-            elif search_type == "code":
-                # Buscar solo en código de la tarjeta
-                filtered_events = [
-                    e for e in filtered_events
-                    if search_term in str(e.get("rfid_card", {}).get("student_code", "")).lower()
-                ]
-            elif search_type == "uid":
-                # Buscar solo en UID
-                filtered_events = [
-                    e for e in filtered_events
-                    if search_term in str(e.get("card_uid", "")).lower()
-                ]
-            elif search_type == "user":
-                # Buscar por usuario ACTUALMENTE asignado a la tarjeta
-                # El search_term es el ID del usuario (sin transformar a lowercase)
-                if search_term:
-                    filtered_events = [
-                        e for e in filtered_events
-                        if e.get("rfid_card", {}).get("user_id") and e.get("rfid_card", {}).get("user_id") == search_term
-                    ]
-        
-        if filters.get("room"):
-            filtered_events = [
-                e for e in filtered_events
-                if e.get("room", {}).get("name", "") == filters["room"]
-            ]
-        
-        if filters.get("building"):
-            filtered_events = [
-                e for e in filtered_events
-                if e.get("building", {}).get("name", "") == filters["building"]
-            ]
-        
-        return {"data": filtered_events, "error": None}
+        return {"data": events[:limit], "error": None, "has_next": len(events) > limit}
     except Exception as exc:
-        return {"data": [], "error": str(exc)}
+        return {"data": [], "error": str(exc), "has_next": False}
 
 
-def _fetch_filter_options(client: Client) -> Dict[str, Any]:
-    """Obtiene opciones para filtros: estudiantes, salones, edificios, usuarios."""
-    options: Dict[str, Any] = {
-        "students": [],
-        "students_by_name": [],
-        "students_by_code": [],
-        "students_by_uid": [],
-        "users": [],  # Nuevo: usuarios del sistema
-        "rooms": [],
-        "buildings": [],
-        "rooms_by_building": {},
-    }
+async def _load_student_options(client: AsyncClient, options: Dict[str, Any]) -> bool:
+    """Obtiene nombres, códigos y UIDs distintos de las tarjetas RFID.
 
+    La función `get_filter_options` calcula en Postgres las listas ya
+    deduplicadas y ordenadas, en lugar de descargar toda la tabla rfid_cards.
+    """
     try:
-        resp_students = client.table(RFID_CARDS_TABLE).select("person_name, student_code, uid").execute()
-        if resp_students.data:
-            names = set()
-            codes = set()
-            uids = set()
-            all_students = set()
-            for row in resp_students.data:
-                # Agregar nombre si existe
-                if row.get("person_name"):
-                    name = str(row["person_name"]).strip()
-                    names.add(name)
-                    all_students.add(name)
-                # Agregar código si existe
-                if row.get("student_code"):
-                    code = str(row["student_code"]).strip()
-                    codes.add(code)
-                    all_students.add(code)
-                # Agregar UID si existe
-                if row.get("uid"):
-                    uid = str(row["uid"]).strip()
-                    uids.add(uid)
-                    all_students.add(uid)
-            
-            options["students"] = sorted(all_students, key=lambda x: x.lower())
-            options["students_by_name"] = sorted(names, key=lambda x: x.lower())
-            options["students_by_code"] = sorted(codes, key=lambda x: x.lower())
-            options["students_by_uid"] = sorted(uids, key=lambda x: x.lower())
+        resp = await client.rpc("get_filter_options").execute()
+        data = resp.data or {}
+        for key in ("students", "students_by_name", "students_by_code", "students_by_uid"):
+            options[key] = data.get(key) or []
     except Exception:
-        pass
+        return False
+    return True
+
 
-    # Obtener usuarios del sistema
+async def _load_user_options(client: AsyncClient, options: Dict[str, Any]) -> bool:
+    """Obtiene usuarios del sistema."""
     try:
-        resp_users = client.table(USERS_TABLE).select("id, name, email").order("name").execute()
+        resp_users = await client.table(USERS_TABLE).select("id, name, email").order("name").execute()
         if resp_users.data:
             user_list = []
             for user in resp_users.data:
@@ -276,65 +231,93 @@ def _fetch_filter_options(client: Client) -> Dict[str, Any]:
                         "name": user.get("name"),
                         "email": user.get("email", "")
                     })
-            options["users"] = sorted(user_list, key=lambda x: x.get("name", "").lower())
+            user_list.sort(key=lambda x: x["name"].casefold())
+            options["users"] = user_list
     except Exception:
-        pass
+        return False
+    return True
 
+
+async def _load_building_options(client: AsyncClient, options: Dict[str, Any]) -> bool:
+    """Obtiene edificios y sus salones (una consulta por tabla)."""
     try:
-        resp_buildings = client.table(BUILDINGS_TABLE).select("*").order("name").execute()
+        resp_buildings, rooms_resp = await asyncio.gather(
+            client.table(BUILDINGS_TABLE).select("*").order("name").execute(),
+            client.table(ROOMS_TABLE).select("id, name, building_id").order("name").execute(),
+        )
         if resp_buildings.data:
             options["buildings"] = [b["name"] for b in resp_buildings.data if b.get("name")]
             
-            # Obtener salones por edificio
+            # Agrupar salones por edificio en memoria
+            rooms_by_bid: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+            for room in rooms_resp.data or []:
+                if room.get("name"):
+                    rooms_by_bid[room.get("building_id")].append(room)
+            
             for building in resp_buildings.data:
-                building_id = building.get("id")
-                building_name = building.get("name")
-                try:
-                    rooms_resp = (
-                        client.table(ROOMS_TABLE)
-                        .select("*")
-                        .eq("building_id", building_id)
-                        .order("name")
-                        .execute()
-                    )
-                    if rooms_resp.data:
-                        options["rooms_by_building"][building_name] = [
-                            r for r in rooms_resp.data if r.get("name")
-                        ]
-                except Exception:
-                    pass
+                rooms = rooms_by_bid.get(building.get("id"))
+                if rooms:
+                    options["rooms_by_building"][building.get("name")] = rooms
     except Exception:
-        pass
+        return False
+    return True
+
+
+async def _fetch_filter_options(client: AsyncClient) -> Dict[str, Any]:
+    """Obtiene opciones para filtros: estudiantes, salones, edificios, usuarios."""
+    options: Dict[str, Any] = {
+        "students": [],
+        "students_by_name": [],
+        "students_by_code": [],
+        "students_by_uid": [],
+        "users": [],  # Nuevo: usuarios del sistema
+        "rooms": [],
+        "buildings": [],
+        "rooms_by_building": {},
+    }
+
+    cached = _cache_get("filter_options")
+    if cached is not None:
+        # Copia superficial: dashboard reemplaza claves del diccionario
+        return dict(cached)
 
-    return options
+    # Las tres consultas son independientes: se ejecutan en paralelo
+    loaded = await asyncio.gather(
+        _load_student_options(client, options),
+        _load_user_options(client, options),
+        _load_building_options(client, options),
+    )
+
+    # Un resultado parcial (alguna consulta falló) no se guarda en el cache
+    if all(loaded):
+        _cache_set("filter_options", options)
+    return dict(options)
 
 
 def _normalize_log_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
-    """Normaliza entrada de acceso para renderizar en templates."""
-    normalized = dict(entry)
-    
-    rfid_card = entry.get("rfid_card", {}) or {}
-    room = entry.get("room", {}) or {}
-    building = entry.get("building", {}) or {}
+    """Normaliza entrada de acceso para renderizar en templates.
+
+    Modifica la entrada en sitio: viene directa de la respuesta HTTP y se
+    descarta tras renderizar, así que no hace falta copiarla.
+    """
+    person_name = entry.get("person_name")
+    student_code = entry.get("student_code")
+    room_name = entry.get("room_name")
+    building_name = entry.get("building_name")
     
-    person_name = rfid_card.get("person_name") if isinstance(rfid_card, dict) else ""
-    student_code = rfid_card.get("student_code") if isinstance(rfid_card, dict) else ""
-    room_name = room.get("name") if isinstance(room, dict) else ""
-    building_name = building.get("name") if isinstance(building, dict) else ""
+    entry["_student_label"] = person_name or student_code or entry.get("card_uid") or "Desconocido"
+    entry["_student_code"] = student_code or ""
+    entry["_room_label"] = room_name or "Sin dato"
+    entry["_building_label"] = building_name or "Sin dato"
+    entry["_is_authorized"] = entry.get("authorized", True)
+    entry["_timestamp"] = entry.get("event_time") or entry.get("created_at") or ""
+    entry["_room_id"] = entry.get("room_id")
     
-    normalized["_student_label"] = person_name or student_code or entry.get("card_uid") or "Desconocido"
-    normalized["_student_code"] = student_code or ""
-    normalized["_room_label"] = room_name or "Sin dato"
-    normalized["_building_label"] = building_name or "Sin dato"
-    normalized["_is_authorized"] = entry.get("authorized", True)
-    normalized["_timestamp"] = entry.get("event_time") or entry.get("created_at") or ""
-    normalized["_room_id"] = room.get("id") if isinstance(room, dict) else entry.get("room_id")
-    
-    return normalized
+    return entry
 
 
-def _block_user_card(
-    client: Client,
+async def _block_user_card(
+    client: AsyncClient,
     *,
     card_uid: str,
     room_id: str,
@@ -351,7 +334,7 @@ def _block_user_card(
     if blocked_by:
         payload["blocked_by"] = blocked_by
 
-    response = (
+    response = await (
         client.table(ACCESS_BLOCKS_TABLE)
         .upsert(payload)
         .execute()
@@ -360,9 +343,9 @@ def _block_user_card(
         raise RuntimeError(response.error)
 
 
-def _unblock_user_card(client: Client, *, block_id: str) -> None:
+async def _unblock_user_card(client: AsyncClient, *, block_id: str) -> None:
     """Elimina un bloqueo."""
-    response = (
+    response = await (
         client.table(ACCESS_BLOCKS_TABLE)
         .delete()
         .eq("id", block_id)
@@ -372,12 +355,12 @@ def _unblock_user_card(client: Client, *, block_id: str) -> None:
         raise RuntimeError(response.error)
 
 
-def _fetch_blocked_cards(client: Client) -> List[Dict[str, Any]]:
+async def _fetch_blocked_cards(client: AsyncClient) -> List[Dict[str, Any]]:
     """Obtiene tarjetas bloqueadas con detalles."""
     try:
-        blocks_resp = (
+        blocks_resp = await (
             client.table(ACCESS_BLOCKS_TABLE)
-            .select("*")
+            .select(ACCESS_BLOCK_SELECT)
             .order("created_at", desc=True)
             .limit(500)
             .execute()
@@ -387,56 +370,18 @@ def _fetch_blocked_cards(client: Client) -> List[Dict[str, Any]]:
             return []
         
         blocks = blocks_resp.data or []
-        enriched_blocks = []
         
+        # access_blocks no declara FK hacia rfid_cards: las tarjetas se resuelven aparte
+        cards_by_uid = await _index_by(
+            client, RFID_CARDS_TABLE, "uid", {b.get("card_uid") for b in blocks}
+        )
+        
+        enriched_blocks = []
         for block in blocks:
             enriched = dict(block)
-            
-            # Obtener datos de tarjeta
-            if block.get("card_uid"):
-                try:
-                    card_resp = (
-                        client.table(RFID_CARDS_TABLE)
-                        .select("*")
-                        .eq("uid", block["card_uid"])
-                        .single()
-                        .execute()
-                    )
-                    if card_resp.data:
-                        enriched["rfid_card"] = card_resp.data
-                except Exception:
-                    pass
-            
-            # Obtener datos de sala
-            if block.get("room_id"):
-                try:
-                    room_resp = (
-                        client.table(ROOMS_TABLE)
-                        .select("*")
-                        .eq("id", block["room_id"])
-                        .single()
-                        .execute()
-                    )
-                    if room_resp.data:
-                        enriched["room"] = room_resp.data
-                        
-                        # Obtener datos de edificio
-                        if room_resp.data.get("building_id"):
-                            try:
-                                building_resp = (
-                                    client.table(BUILDINGS_TABLE)
-                                    .select("*")
-                                    .eq("id", room_resp.data["building_id"])
-                                    .single()
-                                    .execute()
-                                )
-                                if building_resp.data:
-                                    enriched["building"] = building_resp.data
-                            except Exception:
-                                pass
-                except Exception:
-                    pass
-            
+            card = cards_by_uid.get(block.get("card_uid"))
+            if card:
+                enriched["rfid_card"] = card
             enriched_blocks.append(enriched)
         
         return enriched_blocks
@@ -444,10 +389,48 @@ def _fetch_blocked_cards(client: Client) -> List[Dict[str, Any]]:
         return []
 
 
+async def _fetch_rooms_by_building(
+    client: AsyncClient,
+) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+    """Obtiene edificios y salones (en paralelo) con los salones agrupados por edificio."""
+    cached = _cache_get("rooms_by_building")
+    if cached is not None:
+        return cached
+
+    async def _select_all(table: str) -> Optional[List[Dict[str, Any]]]:
+        # None indica error: la página se muestra vacía pero no se cachea
+        try:
+            resp = await client.table(table).select("*").order("name").execute()
+            return resp.data or [] if not getattr(resp, "error", None) else None
+        except Exception:
+            return None
+
+    buildings_resp, rooms_resp = await asyncio.gather(
+        _select_all(BUILDINGS_TABLE), _select_all(ROOMS_TABLE)
+    )
+    buildings = buildings_resp or []
+    all_rooms = rooms_resp or []
+
+    # Crear mapa de building_id -> building_name para referencia rápida
+    building_map = {b["id"]: b["name"] for b in buildings}
+
+    rooms_by_building: Dict[str, List[Dict[str, Any]]] = {}
+    for room in all_rooms:
+        building_name = building_map.get(room.get("building_id"), "Sin edificio")
+        rooms_by_building.setdefault(building_name, []).append(room)
+
+    if buildings_resp is not None and rooms_resp is not None:
+        _cache_set("rooms_by_building", (buildings, rooms_by_building))
+    return buildings, rooms_by_building
+
+
 def _is_safe_redirect(target: str) -> bool:
     if not target:
         return False
-    ref_url = urlparse(request.host_url)
+    # Se parsea una sola vez por petición, solo cuando hay que validar un destino
+    ref_url = g.get("host_url_parsed")
+    if ref_url is None:
+        ref_url = g.host_url_parsed = urlparse(request.host_url)
     test_url = urlparse(urljoin(request.host_url, target))
     return (
         test_url.scheme in {"http", "https"}
@@ -455,29 +438,44 @@ def _is_safe_redirect(target: str) -> bool:
     )
 
 
-def create_app(existing_supabase: Optional[Client] = None) -> Flask:
-    app = Flask(__name__)
+def create_app(existing_supabase: Optional[AsyncClient] = None) -> Quart:
+    app = Quart(__name__)
     app.secret_key = os.getenv("FLASK_SECRET_KEY", "change-me")
     app.supabase = existing_supabase
+    app.http_client = None
 
-    @app.before_request
-    def ensure_supabase_client() -> None:
+    @app.before_serving
+    async def open_supabase_client() -> None:
+        # El pool se crea una vez en el loop del servidor y se cierra al apagarlo
         if app.supabase is None:
-            app.supabase = _create_supabase_client()
+            app.http_client = _create_http_client()
+            app.supabase = await _create_supabase_client(app.http_client)
+
+    @app.after_serving
+    async def close_supabase_client() -> None:
+        if app.http_client is not None:
+            await app.http_client.aclose()
+            app.http_client = None
+            app.supabase = None
 
     @app.route("/", methods=["GET", "POST"])
-    def login():
+    async def login():
         if request.method == "POST":
-            email = request.form.get("email", "").strip()
-            password = request.form.get("password", "")
+            form = await request.form
+            email = form.get("email", "").strip()
+            password = form.get("password", "")
 
             if not email or not password:
-                flash("Correo y contraseña son obligatorios.", "danger")
-                return render_template("login.html")
+                await flash("Correo y contraseña son obligatorios.", "danger")
+                return await render_template("login.html")
+
+            if _login_rate_limited(request.remote_addr or ""):
+                await flash("Demasiados intentos de inicio de sesión. Espera un minuto e inténtalo de nuevo.", "danger")
+                return await render_template("login.html"), 429
 
             try:
                 assert app.supabase is not None
-                auth_response = app.supabase.auth.sign_in_with_password(
+                auth_response = await app.supabase.auth.sign_in_with_password(
                     {"email": email, "password": password}
                 )
                 user = getattr(auth_response, "user", None)
@@ -489,7 +487,7 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
                 is_admin = False
                 
                 try:
-                    user_data_resp = (
+                    user_data_resp = await (
                         app.supabase.table(USERS_TABLE)
                         .select("*")
                         .eq("id", user.id)
@@ -511,22 +509,22 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
                     "name": user_name,
                     "is_admin": is_admin,
                 }
-                flash("Inicio de sesión exitoso.", "success")
+                await flash("Inicio de sesión exitoso.", "success")
                 return redirect(url_for("dashboard"))
             except Exception as e:
-                flash("Credenciales inválidas o error de autenticación.", "danger")
+                await flash("Credenciales inválidas o error de autenticación.", "danger")
 
         if "user" in session:
             return redirect(url_for("dashboard"))
 
-        return render_template("login.html")
+        return await render_template("login.html")
 
     @app.route("/api/search-options/<search_type>")
     @_login_required
-    def get_search_options(search_type: str):
+    async def get_search_options(search_type: str):
         """Obtiene opciones de búsqueda según el tipo."""
         assert app.supabase is not None
-        filter_options = _fetch_filter_options(app.supabase)
+        filter_options = await _fetch_filter_options(app.supabase)
         
         options_map = {
             "name": filter_options.get("students_by_name", []),
@@ -534,11 +532,21 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
             "uid": filter_options.get("students_by_uid", []),
         }
         
-        return jsonify({"options": options_map.get(search_type, [])})
+        options = options_map.get(search_type, [])
+        
+        # El navegador revalida con If-None-Match y recibe 304 si nada cambió
+        etag = hashlib.md5(json.dumps(options).encode()).hexdigest()
+        if request.if_none_match.contains(etag):
+            return "", 304, {"ETag": f'"{etag}"', "Cache-Control": "private, max-age=60"}
+        
+        response = jsonify({"options": options})
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, max-age=60"
+        return response
 
     @app.route("/dashboard")
     @_login_required
-    def dashboard():
+    async def dashboard():
         assert app.supabase is not None
         user_is_admin = session.get("user", {}).get("is_admin", False)
         user_id = session.get("user", {}).get("id")
@@ -552,8 +560,12 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
         try:
             parsed_limit = int(limit_arg) if limit_arg else 0
         except ValueError:
-            flash("El límite debe ser un número entero.", "danger")
+            await flash("El límite debe ser un número entero.", "danger")
             parsed_limit = 0
+        try:
+            page = max(1, int(request.args.get("page", "1")))
+        except ValueError:
+            page = 1
 
         raw_filters = {
             "student": request.args.get("student", "").strip(),
@@ -567,23 +579,24 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
         end_iso = _parse_date_filter(
             request.args.get("end_date", ""), end_of_day=True
         )
-        filters = {**raw_filters, "start_date": start_iso, "end_date": end_iso}
-        logs_result = _fetch_access_logs(app.supabase, filters)
-        normalized_logs = [_normalize_log_entry(row) for row in logs_result["data"]]
-        filter_options = (
-            _fetch_filter_options(app.supabase)
-            if logs_result["error"] is None
-            else {"students": [], "rooms": [], "buildings": []}
+        filters = {**raw_filters, "start_date": start_iso, "end_date": end_iso, "page": page}
+        # Eventos y opciones de filtro son independientes: se consultan en paralelo
+        logs_result, filter_options = await asyncio.gather(
+            _fetch_access_logs(app.supabase, filters),
+            _fetch_filter_options(app.supabase),
         )
+        normalized_logs = [_normalize_log_entry(row) for row in logs_result["data"]]
+        if logs_result["error"] is not None:
+            filter_options = {"students": [], "rooms": [], "buildings": []}
         def _distinct(values):
-            cleaned = []
-            for item in values:
-                value = "" if item is None else str(item).strip()
-                if value:
-                    cleaned.append(value)
-            return sorted(
-                dict.fromkeys(cleaned), key=lambda item: item.lower()
-            )
+            cleaned = [
+                value
+                for value in ("" if item is None else str(item).strip() for item in values)
+                if value
+            ]
+            unique = list(dict.fromkeys(cleaned))
+            unique.sort(key=str.casefold)
+            return unique
 
         if not filter_options["students"]:
             filter_options["students"] = _distinct(
@@ -606,46 +619,54 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
             "end_date": request.args.get("end_date", ""),
             "limit": limit_arg or (raw_filters["limit"] or ""),
         }
-        return render_template(
+        page_args = request.args.to_dict()
+        pagination = {
+            "page": page,
+            "prev_url": url_for("dashboard", **{**page_args, "page": page - 1}) if page > 1 else None,
+            "next_url": url_for("dashboard", **{**page_args, "page": page + 1}) if logs_result["has_next"] else None,
+        }
+        return await render_template(
             "dashboard.html",
             user=session.get("user"),
             logs=normalized_logs,
             logs_error=logs_result["error"],
             filters=filter_defaults,
             filter_options=filter_options,
+            pagination=pagination,
         )
 
     @app.route("/logout")
-    def logout():
+    async def logout():
         session.pop("user", None)
-        flash("Sesión cerrada correctamente.", "info")
+        await flash("Sesión cerrada correctamente.", "info")
         return redirect(url_for("login"))
 
     @app.route("/register", methods=["GET", "POST"])
-    def register():
+    async def register():
         if request.method == "POST":
-            email = request.form.get("email", "").strip()
-            password = request.form.get("password", "").strip()
-            name = request.form.get("name", "").strip()
-            confirm_password = request.form.get("confirm_password", "").strip()
+            form = await request.form
+            email = form.get("email", "").strip()
+            password = form.get("password", "").strip()
+            name = form.get("name", "").strip()
+            confirm_password = form.get("confirm_password", "").strip()
 
             if not email or not password or not name:
-                flash("Todos los campos son obligatorios.", "danger")
-                return render_template("register.html")
+                await flash("Todos los campos son obligatorios.", "danger")
+                return await render_template("register.html")
 
             if password != confirm_password:
-                flash("Las contraseñas no coinciden.", "danger")
-                return render_template("register.html")
+                await flash("Las contraseñas no coinciden.", "danger")
+                return await render_template("register.html")
 
             if len(password) < 6:
-                flash("La contraseña debe tener al menos 6 caracteres.", "danger")
-                return render_template("register.html")
+                await flash("La contraseña debe tener al menos 6 caracteres.", "danger")
+                return await render_template("register.html")
 
             try:
                 assert app.supabase is not None
                 
                 # Crear usuario en Auth (el trigger en BD crea automáticamente el registro en users)
-                auth_response = app.supabase.auth.sign_up({
+                auth_response = await app.supabase.auth.sign_up({
                     "email": email,
                     "password": password,
                     "options": {
@@ -661,7 +682,7 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
 
                 # Confirmar email automáticamente usando admin API
                 try:
-                    app.supabase.auth.admin.update_user_by_id(
+                    await app.supabase.auth.admin.update_user_by_id(
                         auth_user.id,
                         {"email_confirm": True}
                     )
@@ -669,28 +690,29 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
                     # Si falla la confirmación automática, no impide el registro
                     print(f"Advertencia: No se pudo confirmar email automáticamente: {confirm_error}")
 
-                flash("Registro exitoso. Ya puedes iniciar sesión.", "success")
+                await flash("Registro exitoso. Ya puedes iniciar sesión.", "success")
                 return redirect(url_for("login"))
             except Exception as e:
-                flash(f"Error en el registro: {str(e)}", "danger")
+                await flash(f"Error en el registro: {str(e)}", "danger")
 
         if "user" in session:
             return redirect(url_for("dashboard"))
 
-        return render_template("register.html")
+        return await render_template("register.html")
 
     @app.route("/block-access", methods=["POST"])
     @_login_required
-    def block_access():
-        card_uid = request.form.get("card_uid", "").strip()
-        room_id = request.form.get("room_id", "").strip()
-        reason = request.form.get("reason", "").strip()
-        student_name = request.form.get("student_name", "").strip()
-        room_name = request.form.get("room_name", "").strip()
-        next_url = request.form.get("next", "")
+    async def block_access():
+        form = await request.form
+        card_uid = form.get("card_uid", "").strip()
+        room_id = form.get("room_id", "").strip()
+        reason = form.get("reason", "").strip()
+        student_name = form.get("student_name", "").strip()
+        room_name = form.get("room_name", "").strip()
+        next_url = form.get("next", "")
 
         if not card_uid or not room_id:
-            flash(
+            await flash(
                 "Se requieren al menos el UID de tarjeta y el ID de salón para bloquear.",
                 "danger",
             )
@@ -700,32 +722,32 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
         try:
             assert app.supabase is not None
             user_id = session.get("user", {}).get("id")
-            _block_user_card(
+            await _block_user_card(
                 app.supabase,
                 card_uid=card_uid,
                 room_id=room_id,
                 reason=reason or None,
                 blocked_by=user_id,
             )
-            flash(
+            await flash(
                 f"Tarjeta {card_uid} ({student_name or 'usuario'}) bloqueada "
                 f"para {room_name or 'salón'} correctamente.",
                 "success",
             )
         except Exception as exc:
-            flash(f"No fue posible bloquear la tarjeta: {exc}", "danger")
+            await flash(f"No fue posible bloquear la tarjeta: {exc}", "danger")
 
         fallback = next_url if _is_safe_redirect(next_url) else url_for("dashboard")
         return redirect(fallback)
 
     @app.route("/blocked-cards")
     @_login_required
-    def blocked_cards():
+    async def blocked_cards():
         """Muestra todas las tarjetas bloqueadas."""
         assert app.supabase is not None
-        blocked = _fetch_blocked_cards(app.supabase)
+        blocked = await _fetch_blocked_cards(app.supabase)
         
-        return render_template(
+        return await render_template(
             "blocked_cards.html",
             user=session.get("user"),
             blocked_cards=blocked,
@@ -734,52 +756,30 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
 
     @app.route("/unblock-card/<block_id>", methods=["POST"])
     @_login_required
-    def unblock_card(block_id):
+    async def unblock_card(block_id):
         """Desbloquea una tarjeta."""
-        next_url = request.form.get("next", "")
+        form = await request.form
+        next_url = form.get("next", "")
         
         try:
             assert app.supabase is not None
-            _unblock_user_card(app.supabase, block_id=block_id)
-            flash("Tarjeta desbloqueada correctamente.", "success")
+            await _unblock_user_card(app.supabase, block_id=block_id)
+            await flash("Tarjeta desbloqueada correctamente.", "success")
         except Exception as exc:
-            flash(f"No fue posible desbloquear la tarjeta: {exc}", "danger")
+            await flash(f"No fue posible desbloquear la tarjeta: {exc}", "danger")
         
         fallback = next_url if _is_safe_redirect(next_url) else url_for("blocked_cards")
         return redirect(fallback)
 
     @app.route("/rooms")
     @_login_required
-    def rooms():
+    async def rooms():
         """Lista y gestiona salones."""
         assert app.supabase is not None
         
-        # Obtener todos los edificios y salones
-        try:
-            buildings_resp = app.supabase.table(BUILDINGS_TABLE).select("*").order("name").execute()
-            buildings = buildings_resp.data or [] if not getattr(buildings_resp, "error", None) else []
-        except Exception:
-            buildings = []
-        
-        # Crear mapa de building_id -> building_name para referencia rápida
-        building_map = {b["id"]: b["name"] for b in buildings}
-        
-        rooms_by_building = {}
-        try:
-            rooms_resp = app.supabase.table(ROOMS_TABLE).select("*").order("name").execute()
-            all_rooms = rooms_resp.data or [] if not getattr(rooms_resp, "error", None) else []
-            
-            for room in all_rooms:
-                building_id = room.get("building_id")
-                building_name = building_map.get(building_id, "Sin edificio")
-                
-                if building_name not in rooms_by_building:
-                    rooms_by_building[building_name] = []
-                rooms_by_building[building_name].append(room)
-        except Exception:
-            pass
+        buildings, rooms_by_building = await _fetch_rooms_by_building(app.supabase)
         
-        return render_template(
+        return await render_template(
             "rooms.html",
             user=session.get("user"),
             buildings=buildings,
@@ -788,37 +788,14 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
 
     @app.route("/spaces")
     @_login_required
-    def spaces():
+    async def spaces():
         """Gestión unificada de edificios y salones."""
         assert app.supabase is not None
         
-        # Obtener todos los edificios
-        try:
-            buildings_resp = app.supabase.table(BUILDINGS_TABLE).select("*").order("name").execute()
-            buildings = buildings_resp.data or [] if not getattr(buildings_resp, "error", None) else []
-        except Exception:
-            buildings = []
-        
-        # Crear mapa de building_id -> building_name para referencia rápida
-        building_map = {b["id"]: b["name"] for b in buildings}
-        
-        # Obtener todos los salones organizados por edificio
-        rooms_by_building = {}
-        try:
-            rooms_resp = app.supabase.table(ROOMS_TABLE).select("*").order("name").execute()
-            all_rooms = rooms_resp.data or [] if not getattr(rooms_resp, "error", None) else []
-            
-            for room in all_rooms:
-                building_id = room.get("building_id")
-                building_name = building_map.get(building_id, "Sin edificio")
-                
-                if building_name not in rooms_by_building:
-                    rooms_by_building[building_name] = []
-                rooms_by_building[building_name].append(room)
-        except Exception:
-            pass
+        # Obtener todos los edificios y salones organizados por edificio
+        buildings, rooms_by_building = await _fetch_rooms_by_building(app.supabase)
         
-        return render_template(
+        return await render_template(
             "spaces.html",
             user=session.get("user"),
             buildings=buildings,
@@ -827,15 +804,16 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
 
     @app.route("/add-room", methods=["POST"])
     @_login_required
-    def add_room():
+    async def add_room():
         """Agrega un nuevo salón."""
-        name = request.form.get("name", "").strip()
-        building_id = request.form.get("building_id", "").strip()
-        room_type = request.form.get("type", "AULA").strip()
-        next_url = request.form.get("next", "")
+        form = await request.form
+        name = form.get("name", "").strip()
+        building_id = form.get("building_id", "").strip()
+        room_type = form.get("type", "AULA").strip()
+        next_url = form.get("next", "")
         
         if not name or not building_id:
-            flash("El nombre y edificio del salón son obligatorios.", "danger")
+            await flash("El nombre y edificio del salón son obligatorios.", "danger")
         else:
             try:
                 assert app.supabase is not None
@@ -844,30 +822,31 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
                     "building_id": building_id,
                     "type": room_type,
                 }
-                response = app.supabase.table(ROOMS_TABLE).insert(payload).execute()
+                response = await app.supabase.table(ROOMS_TABLE).insert(payload).execute()
+                _options_cache.clear()
                 if not getattr(response, "error", None):
-                    flash(f"Salón '{name}' agregado correctamente.", "success")
+                    await flash(f"Salón '{name}' agregado correctamente.", "success")
                 else:
-                    flash(f"Error al agregar salón: {response.error}", "danger")
+                    await flash(f"Error al agregar salón: {response.error}", "danger")
             except Exception as exc:
-                flash(f"Error al agregar salón: {exc}", "danger")
+                await flash(f"Error al agregar salón: {exc}", "danger")
         
         fallback = next_url if _is_safe_redirect(next_url) else url_for("rooms")
         return redirect(fallback)
 
     @app.route("/buildings")
     @_login_required
-    def buildings():
+    async def buildings():
         """Lista y gestiona edificios."""
         assert app.supabase is not None
         
         try:
-            buildings_resp = app.supabase.table(BUILDINGS_TABLE).select("*").order("name").execute()
+            buildings_resp = await app.supabase.table(BUILDINGS_TABLE).select("*").order("name").execute()
             buildings_list = buildings_resp.data or [] if not getattr(buildings_resp, "error", None) else []
         except Exception:
             buildings_list = []
         
-        return render_template(
+        return await render_template(
             "buildings.html",
             user=session.get("user"),
             buildings=buildings_list,
@@ -875,88 +854,95 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
 
     @app.route("/add-building", methods=["POST"])
     @_login_required
-    def add_building():
+    async def add_building():
         """Agrega un nuevo edificio."""
-        name = request.form.get("name", "").strip()
-        next_url = request.form.get("next", "")
+        form = await request.form
+        name = form.get("name", "").strip()
+        next_url = form.get("next", "")
         
         if not name:
-            flash("El nombre del edificio es obligatorio.", "danger")
+            await flash("El nombre del edificio es obligatorio.", "danger")
         else:
             try:
                 assert app.supabase is not None
                 payload = {"name": name}
-                response = app.supabase.table(BUILDINGS_TABLE).insert(payload).execute()
+                response = await app.supabase.table(BUILDINGS_TABLE).insert(payload).execute()
+                _options_cache.clear()
                 if not getattr(response, "error", None):
-                    flash(f"Edificio '{name}' agregado correctamente.", "success")
+                    await flash(f"Edificio '{name}' agregado correctamente.", "success")
                 else:
-                    flash(f"Error al agregar edificio: {response.error}", "danger")
+                    await flash(f"Error al agregar edificio: {response.error}", "danger")
             except Exception as exc:
-                flash(f"Error al agregar edificio: {exc}", "danger")
+                await flash(f"Error al agregar edificio: {exc}", "danger")
         
         fallback = next_url if _is_safe_redirect(next_url) else url_for("buildings")
         return redirect(fallback)
 
     @app.route("/edit-building/<building_id>", methods=["POST"])
     @_login_required
-    def edit_building(building_id: str):
+    async def edit_building(building_id: str):
         """Edita un edificio existente."""
-        name = request.form.get("name", "").strip()
-        next_url = request.form.get("next", "")
+        form = await request.form
+        name = form.get("name", "").strip()
+        next_url = form.get("next", "")
         
         if not name:
-            flash("El nombre del edificio es obligatorio.", "danger")
+            await flash("El nombre del edificio es obligatorio.", "danger")
         else:
             try:
                 assert app.supabase is not None
                 payload = {"name": name}
-                response = app.supabase.table(BUILDINGS_TABLE).update(payload).eq("id", building_id).execute()
+                response = await app.supabase.table(BUILDINGS_TABLE).update(payload).eq("id", building_id).execute()
+                _options_cache.clear()
                 if not getattr(response, "error", None):
-                    flash(f"Edificio actualizado correctamente.", "success")
+                    await flash(f"Edificio actualizado correctamente.", "success")
                 else:
-                    flash(f"Error al actualizar edificio: {response.error}", "danger")
+                    await flash(f"Error al actualizar edificio: {response.error}", "danger")
             except Exception as exc:
-                flash(f"Error al actualizar edificio: {exc}", "danger")
+                await flash(f"Error al actualizar edificio: {exc}", "danger")
         
         fallback = next_url if _is_safe_redirect(next_url) else url_for("buildings")
         return redirect(fallback)
 
     @app.route("/delete-building/<building_id>", methods=["POST"])
     @_login_required
-    def delete_building(building_id: str):
+    async def delete_building(building_id: str):
         """Elimina un edificio."""
-        next_url = request.form.get("next", "")
+        form = await request.form
+        next_url = form.get("next", "")
         
         # Protección contra valores inválidos (ej: 'null', '', 'undefined')
         if not building_id or str(building_id).lower() in ("null", "none", "undefined"):
-            flash("ID de edificio inválido. No se puede eliminar.", "danger")
+            await flash("ID de edificio inválido. No se puede eliminar.", "danger")
             fallback = next_url if _is_safe_redirect(next_url) else url_for("spaces")
             return redirect(fallback)
 
         try:
             assert app.supabase is not None
-            response = app.supabase.table(BUILDINGS_TABLE).delete().eq("id", building_id).execute()
+            response = await app.supabase.table(BUILDINGS_TABLE).delete().eq("id", building_id).execute()
+            _options_cache.clear()
             if not getattr(response, "error", None):
-                flash("Edificio eliminado correctamente.", "success")
+                await flash("Edificio eliminado correctamente.", "success")
             else:
-                flash(f"Error al eliminar edificio: {response.error}", "danger")
+                await flash(f"Error al eliminar edificio: {response.error}", "danger")
         except Exception as exc:
-            flash(f"Error al eliminar edificio: {exc}", "danger")
+            await flash(f"Error al eliminar edificio: {exc}", "danger")
 
         fallback = next_url if _is_safe_redirect(next_url) else url_for("spaces")
         return redirect(fallback)
 
     @app.route("/edit-room/<room_id>", methods=["POST"])
     @_login_required
-    def edit_room(room_id: str):
+    async def edit_room(room_id: str):
         """Edita un salón existente."""
-        name = request.form.get("name", "").strip()
-        building_id = request.form.get("building_id", "").strip()
-        room_type = request.form.get("type", "AULA").strip()
-        next_url = request.form.get("next", "")
+        form = await request.form
+        name = form.get("name", "").strip()
+        building_id = form.get("building_id", "").strip()
+        room_type = form.get("type", "AULA").strip()
+        next_url = form.get("next", "")
         
         if not name or not building_id:
-            flash("El nombre y edificio del salón son obligatorios.", "danger")
+            await flash("El nombre y edificio del salón son obligatorios.", "danger")
         else:
             try:
                 assert app.supabase is not None
@@ -965,49 +951,52 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
                     "building_id": building_id,
                     "type": room_type,
                 }
-                response = app.supabase.table(ROOMS_TABLE).update(payload).eq("id", room_id).execute()
+                response = await app.supabase.table(ROOMS_TABLE).update(payload).eq("id", room_id).execute()
+                _options_cache.clear()
                 if not getattr(response, "error", None):
-                    flash(f"Salón actualizado correctamente.", "success")
+                    await flash(f"Salón actualizado correctamente.", "success")
                 else:
-                    flash(f"Error al actualizar salón: {response.error}", "danger")
+                    await flash(f"Error al actualizar salón: {response.error}", "danger")
             except Exception as exc:
-                flash(f"Error al actualizar salón: {exc}", "danger")
+                await flash(f"Error al actualizar salón: {exc}", "danger")
         
         fallback = next_url if _is_safe_redirect(next_url) else url_for("rooms")
         return redirect(fallback)
 
     @app.route("/delete-room/<room_id>", methods=["POST"])
     @_login_required
-    def delete_room(room_id: str):
+    async def delete_room(room_id: str):
         """Elimina un salón."""
-        next_url = request.form.get("next", "")
+        form = await request.form
+        next_url = form.get("next", "")
         
         try:
             assert app.supabase is not None
-            response = app.supabase.table(ROOMS_TABLE).delete().eq("id", room_id).execute()
+            response = await app.supabase.table(ROOMS_TABLE).delete().eq("id", room_id).execute()
+            _options_cache.clear()
             if not getattr(response, "error", None):
-                flash("Salón eliminado correctamente.", "success")
+                await flash("Salón eliminado correctamente.", "success")
             else:
-                flash(f"Error al eliminar salón: {response.error}", "danger")
+                await flash(f"Error al eliminar salón: {response.error}", "danger")
         except Exception as exc:
-            flash(f"Error al eliminar salón: {exc}", "danger")
+            await flash(f"Error al eliminar salón: {exc}", "danger")
         
         fallback = next_url if _is_safe_redirect(next_url) else url_for("spaces")
         return redirect(fallback)
 
     @app.route("/manage-cards")
     @_login_required
-    def manage_cards():
+    async def manage_cards():
         """Gestión de tarjetas RFID (solo para admin)."""
         assert app.supabase is not None
         
         if not session.get("user", {}).get("is_admin"):
-            flash("No tienes permisos para acceder a esta página.", "danger")
+            await flash("No tienes permisos para acceder a esta página.", "danger")
             return redirect(url_for("dashboard"))
         
         # Obtener todas las tarjetas con información del usuario
         try:
-            cards_resp = (
+            cards_resp = await (
                 app.supabase.table(RFID_CARDS_TABLE)
                 .select("*")
                 .order("created_at", desc=True)
@@ -1020,7 +1009,7 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
             for card in cards:
                 if card.get("user_id"):
                     try:
-                        user_resp = (
+                        user_resp = await (
                             app.supabase.table(USERS_TABLE)
                             .select("*")
                             .eq("id", card["user_id"])
@@ -1037,7 +1026,7 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
         
         # Obtener lista de usuarios disponibles para asignar
         try:
-            users_resp = (
+            users_resp = await (
                 app.supabase.table(USERS_TABLE)
                 .select("*")
                 .order("name")
@@ -1047,7 +1036,7 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
         except Exception:
             users = []
         
-        return render_template(
+        return await render_template(
             "manage_cards.html",
             user=session.get("user"),
             cards=cards,
@@ -1056,22 +1045,23 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
 
     @app.route("/add-card", methods=["POST"])
     @_login_required
-    def add_card():
+    async def add_card():
         """Añade una nueva tarjeta RFID."""
         assert app.supabase is not None
         
         if not session.get("user", {}).get("is_admin"):
-            flash("No tienes permisos para realizar esta acción.", "danger")
+            await flash("No tienes permisos para realizar esta acción.", "danger")
             return redirect(url_for("dashboard"))
         
-        uid = request.form.get("uid", "").strip()
-        name = request.form.get("name", "").strip()
-        code = request.form.get("code", "").strip()
-        user_id = request.form.get("user_id", "").strip() or None
-        next_url = request.form.get("next", "")
+        form = await request.form
+        uid = form.get("uid", "").strip()
+        name = form.get("name", "").strip()
+        code = form.get("code", "").strip()
+        user_id = form.get("user_id", "").strip() or None
+        next_url = form.get("next", "")
         
         if not uid or not name or not code:
-            flash("UID, nombre y código son obligatorios.", "danger")
+            await flash("UID, nombre y código son obligatorios.", "danger")
         else:
             try:
                 payload = {
@@ -1082,35 +1072,38 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
                 if user_id:
                     payload["user_id"] = user_id
                 
-                response = app.supabase.table(RFID_CARDS_TABLE).insert(payload).execute()
+                response = await app.supabase.table(RFID_CARDS_TABLE).insert(payload).execute()
+                
+                _options_cache.clear()
                 if not getattr(response, "error", None):
-                    flash(f"Tarjeta '{name}' creada correctamente.", "success")
+                    await flash(f"Tarjeta '{name}' creada correctamente.", "success")
                 else:
-                    flash(f"Error al crear tarjeta: {response.error}", "danger")
+                    await flash(f"Error al crear tarjeta: {response.error}", "danger")
             except Exception as exc:
-                flash(f"Error al crear tarjeta: {exc}", "danger")
+                await flash(f"Error al crear tarjeta: {exc}", "danger")
         
         fallback = next_url if _is_safe_redirect(next_url) else url_for("manage_cards")
         return redirect(fallback)
 
     @app.route("/edit-card/<card_uid>", methods=["POST"])
     @_login_required
-    def edit_card(card_uid: str):
+    async def edit_card(card_uid: str):
         """Edita una tarjeta RFID."""
         assert app.supabase is not None
         
         if not session.get("user", {}).get("is_admin"):
-            flash("No tienes permisos para realizar esta acción.", "danger")
+            await flash("No tienes permisos para realizar esta acción.", "danger")
             return redirect(url_for("dashboard"))
         
-        uid = request.form.get("uid", "").strip()
-        name = request.form.get("name", "").strip()
-        code = request.form.get("code", "").strip()
-        user_id = request.form.get("user_id", "").strip() or None
-        next_url = request.form.get("next", "")
+        form = await request.form
+        uid = form.get("uid", "").strip()
+        name = form.get("name", "").strip()
+        code = form.get("code", "").strip()
+        user_id = form.get("user_id", "").strip() or None
+        next_url = form.get("next", "")
         
         if not uid or not name or not code:
-            flash("UID, nombre y código son obligatorios.", "danger")
+            await flash("UID, nombre y código son obligatorios.", "danger")
         else:
             try:
                 payload = {
@@ -1123,20 +1116,22 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
                 else:
                     payload["user_id"] = None
                 
-                response = app.supabase.table(RFID_CARDS_TABLE).update(payload).eq("uid", card_uid).execute()
+                response = await app.supabase.table(RFID_CARDS_TABLE).update(payload).eq("uid", card_uid).execute()
+                
+                _options_cache.clear()
                 if not getattr(response, "error", None):
-                    flash(f"Tarjeta actualizada correctamente.", "success")
+                    await flash(f"Tarjeta actualizada correctamente.", "success")
                 else:
-                    flash(f"Error al actualizar tarjeta: {response.error}", "danger")
+                    await flash(f"Error al actualizar tarjeta: {response.error}", "danger")
             except Exception as exc:
-                flash(f"Error al actualizar tarjeta: {exc}", "danger")
+                await flash(f"Error al actualizar tarjeta: {exc}", "danger")
         
         fallback = next_url if _is_safe_redirect(next_url) else url_for("manage_cards")
         return redirect(fallback)
 
     @app.route("/my-profile")
     @_login_required
-    def my_profile():
+    async def my_profile():
         """Perfil del usuario con su tarjeta y accesos."""
         assert app.supabase is not None
         user_id = session.get("user", {}).get("id")
@@ -1144,7 +1139,7 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
         # Obtener tarjeta del usuario
         user_card = None
         try:
-            card_resp = (
+            card_resp = await (
                 app.supabase.table(RFID_CARDS_TABLE)
                 .select("*")
                 .eq("user_id", user_id)
@@ -1160,55 +1155,20 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
         user_accesses = []
         if user_card:
             try:
-                accesses_resp = (
+                accesses_resp = await (
                     app.supabase.table(ACCESS_EVENTS_TABLE)
-                    .select("*")
+                    .select(f"*, {ROOM_WITH_BUILDING_SELECT}")
                     .eq("card_uid", user_card["uid"])
                     .order("event_time", desc=True)
                     .limit(100)
                     .execute()
                 )
                 
-                if accesses_resp.data:
-                    for access in accesses_resp.data:
-                        enriched = dict(access)
-                        
-                        # Obtener datos de sala
-                        if access.get("room_id"):
-                            try:
-                                room_resp = (
-                                    app.supabase.table(ROOMS_TABLE)
-                                    .select("*")
-                                    .eq("id", access["room_id"])
-                                    .limit(1)
-                                    .execute()
-                                )
-                                if room_resp.data and len(room_resp.data) > 0:
-                                    room_data = room_resp.data[0]
-                                    enriched["room"] = room_data
-                                    
-                                    # Obtener datos de edificio
-                                    if room_data.get("building_id"):
-                                        try:
-                                            building_resp = (
-                                                app.supabase.table(BUILDINGS_TABLE)
-                                                .select("*")
-                                                .eq("id", room_data["building_id"])
-                                                .limit(1)
-                                                .execute()
-                                            )
-                                            if building_resp.data and len(building_resp.data) > 0:
-                                                enriched["building"] = building_resp.data[0]
-                                        except Exception:
-                                            pass
-                            except Exception:
-                                pass
-                        
-                        user_accesses.append(enriched)
+                user_accesses = accesses_resp.data or []
             except Exception:
                 pass
         
-        return render_template(
+        return await render_template(
             "my_profile.html",
             user=session.get("user"),
             user_card=user_card,
@@ -1217,24 +1177,26 @@ def create_app(existing_supabase: Optional[Client] = None) -> Flask:
 
     @app.route("/delete-card/<card_uid>", methods=["POST"])
     @_login_required
-    def delete_card(card_uid: str):
+    async def delete_card(card_uid: str):
         """Elimina una tarjeta RFID."""
         assert app.supabase is not None
         
         if not session.get("user", {}).get("is_admin"):
-            flash("No tienes permisos para realizar esta acción.", "danger")
+            await flash("No tienes permisos para realizar esta acción.", "danger")
             return redirect(url_for("dashboard"))
         
-        next_url = request.form.get("next", "")
+        form = await request.form
+        next_url = form.get("next", "")
         
         try:
-            response = app.supabase.table(RFID_CARDS_TABLE).delete().eq("uid", card_uid).execute()
+            response = await app.supabase.table(RFID_CARDS_TABLE).delete().eq("uid", card_uid).execute()
+            _options_cache.clear()
             if not getattr(response, "error", None):
-                flash("Tarjeta eliminada correctamente.", "success")
+                await flash("Tarjeta eliminada correctamente.", "success")
             else:
-                flash(f"Error al eliminar tarjeta: {response.error}", "danger")
+                await flash(f"Error al eliminar tarjeta: {response.error}", "danger")
         except Exception as exc:
-            flash(f"Error al eliminar tarjeta: {exc}", "danger")
+            await flash(f"Error al eliminar tarjeta: {exc}", "danger")
         
         fallback = next_url if _is_safe_redirect(next_url) else url_for("manage_cards")
         return redirect(fallback)
@@ -1,51 +1,80 @@
 import os
+from dataclasses import dataclass
+from typing import Optional
 from dotenv import load_dotenv
 
 # Cargar variables de entorno desde .env
 load_dotenv()
 
-# Supabase Cloud Configuration
-# Obtén estos valores del Supabase Dashboard
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-if not SUPABASE_URL:
-    raise ValueError("SUPABASE_URL no está configurado en .env")
 
-# Publishable (anon) key - NUNCA uses service role key en el cliente
-SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
-if not SUPABASE_KEY:
-    raise ValueError("SUPABASE_ANON_KEY no está configurado en .env")
+def _required(name: str) -> str:
+    value = os.getenv(name)
+    if not value:
+        raise ValueError(f"{name} no está configurado en .env")
+    return value
 
-LOCAL_DB = os.getenv("LOCAL_DB", "/var/local/tagpass.db")
 
-# Ya no configuramos ROOM_ID/DEVICE_ID manualmente. Se descubren desde la BD.
-# Puedes opcionalmente dar un nombre y ubicación para registrar o encontrar este dispositivo.
-DEVICE_NAME = os.getenv("DEVICE_NAME", "")  # por defecto usaremos el hostname
-DEVICE_LOCATION = os.getenv("DEVICE_LOCATION", "")
+@dataclass(frozen=True)
+class Config:
+    """Configuración del dispositivo, leída una sola vez al importar el módulo."""
 
-# Segundos entre sincronizaciones con la nube (optimizado para sincronización casi instantánea)
-SYNC_INTERVAL = int(os.getenv("SYNC_INTERVAL", "2"))
+    # Supabase Cloud Configuration
+    # Obtén estos valores del Supabase Dashboard
+    SUPABASE_URL: str
+    # Publishable (anon) key - NUNCA uses service role key en el cliente
+    SUPABASE_KEY: str
 
-# Backoff para reintentos del worker (en segundos)
-BACKOFF_MIN = int(os.getenv("BACKOFF_MIN", "5"))
-BACKOFF_MAX = int(os.getenv("BACKOFF_MAX", "300"))
+    LOCAL_DB: str
 
-# Credenciales del usuario de servicio para este dispositivo
-# IMPORTANTE: Crea un usuario específico en Supabase Auth para cada Raspberry
-# No uses credenciales compartidas. Este usuario debe tener permisos limitados.
-SUPABASE_EMAIL = os.getenv("SUPABASE_EMAIL")
-if not SUPABASE_EMAIL:
-    raise ValueError("SUPABASE_EMAIL no está configurado en .env")
+    # Ya no configuramos ROOM_ID/DEVICE_ID manualmente. Se descubren desde la BD.
+    # Puedes opcionalmente dar un nombre y ubicación para registrar o encontrar este dispositivo.
+    DEVICE_NAME: str  # por defecto usaremos el hostname
+    DEVICE_LOCATION: str
 
-SUPABASE_PASSWORD = os.getenv("SUPABASE_PASSWORD")
-if not SUPABASE_PASSWORD:
-    raise ValueError("SUPABASE_PASSWORD no está configurado en .env")
+    # Segundos entre sincronizaciones con la nube (optimizado para sincronización casi instantánea)
+    SYNC_INTERVAL: int
 
-# Cada cuánto renovamos la sesión (segundos).
-# Si está vacío email/password, el worker continuará como ANON sin autenticación.
-AUTH_REFRESH_SECONDS = int(os.getenv("AUTH_REFRESH_SECONDS", "1800"))
+    # Backoff para reintentos del worker (en segundos)
+    BACKOFF_MIN: int
+    BACKOFF_MAX: int
 
-# Si es true, el proceso esperará a iniciar sesión antes de continuar
-AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "true").lower() in ("1", "true", "yes")
+    # Credenciales del usuario de servicio para este dispositivo
+    # IMPORTANTE: Crea un usuario específico en Supabase Auth para cada Raspberry
+    # No uses credenciales compartidas. Este usuario debe tener permisos limitados.
+    SUPABASE_EMAIL: Optional[str]
+    SUPABASE_PASSWORD: Optional[str]
 
-# Si Realtime no está disponible con el cliente sync, uso polling como fallback
-POLL_BLOCKS_INTERVAL = int(os.getenv("POLL_BLOCKS_INTERVAL", "15"))  # segundos
+    # Cada cuánto renovamos la sesión (segundos).
+    # Si está vacío email/password, el worker continuará como ANON sin autenticación.
+    AUTH_REFRESH_SECONDS: int
+
+    # Si es true, el proceso esperará a iniciar sesión antes de continuar
+    AUTH_REQUIRED: bool
+
+    # Si Realtime no está disponible con el cliente sync, uso polling como fallback
+    POLL_BLOCKS_INTERVAL: int  # segundos
+
+    # Cada cuánto se ejecuta el mantenimiento de la base local (PRAGMA optimize)
+    DB_MAINTENANCE_INTERVAL: int  # segundos
+
+    # Días que se conservan en local los eventos ya sincronizados (purga diaria)
+    LOCAL_EVENTS_RETENTION_DAYS: int
+
+
+CFG = Config(
+    SUPABASE_URL=_required("SUPABASE_URL"),
+    SUPABASE_KEY=_required("SUPABASE_ANON_KEY"),
+    LOCAL_DB=os.getenv("LOCAL_DB", "/var/local/tagpass.db"),
+    DEVICE_NAME=os.getenv("DEVICE_NAME", ""),
+    DEVICE_LOCATION=os.getenv("DEVICE_LOCATION", ""),
+    SYNC_INTERVAL=int(os.getenv("SYNC_INTERVAL", "2")),
+    BACKOFF_MIN=int(os.getenv("BACKOFF_MIN", "5")),
+    BACKOFF_MAX=int(os.getenv("BACKOFF_MAX", "300")),
+    SUPABASE_EMAIL=_required("SUPABASE_EMAIL"),
+    SUPABASE_PASSWORD=_required("SUPABASE_PASSWORD"),
+    AUTH_REFRESH_SECONDS=int(os.getenv("AUTH_REFRESH_SECONDS", "1800")),
+    AUTH_REQUIRED=os.getenv("AUTH_REQUIRED", "true").lower() in ("1", "true", "yes"),
+    POLL_BLOCKS_INTERVAL=int(os.getenv("POLL_BLOCKS_INTERVAL", "15")),
+    DB_MAINTENANCE_INTERVAL=int(os.getenv("DB_MAINTENANCE_INTERVAL", "900")),
+    LOCAL_EVENTS_RETENTION_DAYS=int(os.getenv("LOCAL_EVENTS_RETENTION_DAYS", "7")),
+)
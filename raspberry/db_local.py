@@ -1,18 +1,115 @@
+import json
 import sqlite3
+import threading
+from contextlib import contextmanager
 from typing import Tuple
 DEFAULT_ROOM_ID = ""
 
-# Utilidad simple para obtener una conexión con WAL habilitado (mejor para escrituras concurrentes)
+# SQL de las rutas frecuentes como constantes: el texto idéntico reutiliza la
+# sentencia ya preparada en el cache de la conexión (cached_statements).
+_SQL_INSERT_EVENT = "INSERT INTO local_events (card_uid, authorized) VALUES (?, ?)"
+_SQL_SELECT_UNSYNCED = "SELECT id, card_uid, timestamp, authorized FROM local_events WHERE synced = 0"
+_SQL_HAS_UNSYNCED = "SELECT 1 FROM local_events WHERE synced = 0 LIMIT 1"
+_SQL_MARK_SYNCED = "UPDATE local_events SET synced = 1 WHERE id IN (SELECT value FROM json_each(?))"
+_SQL_UPSERT_BLOCKED = "INSERT OR REPLACE INTO blocked_cards (card_uid, room_id, updated_at) VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP))"
+_SQL_DELETE_BLOCKED = "DELETE FROM blocked_cards WHERE card_uid = ? AND room_id = ?"
+_SQL_SELECT_BLOCKED = "SELECT card_uid, room_id FROM blocked_cards"
+_SQL_COUNTS = """
+    SELECT
+        (SELECT COUNT(*) FROM local_events WHERE synced = 0),
+        (SELECT COUNT(*) FROM local_events),
+        (SELECT COUNT(*) FROM blocked_cards)
+"""
+_SQL_RESET_VALID_UIDS = "DELETE FROM temp.valid_uids"
+_SQL_INSERT_VALID_UID = "INSERT OR IGNORE INTO temp.valid_uids (uid) VALUES (?)"
+_SQL_SELECT_VALID_UNSYNCED = """
+    SELECT e.id, e.card_uid, e.timestamp, e.authorized
+    FROM local_events e
+    JOIN temp.valid_uids v ON v.uid = e.card_uid
+    WHERE e.synced = 0
+    ORDER BY e.id
+"""
+_SQL_DISCARD_INVALID = "UPDATE local_events SET synced = 1 WHERE synced = 0 AND card_uid NOT IN (SELECT uid FROM temp.valid_uids)"
+_SQL_PRUNE_SYNCED = "DELETE FROM local_events WHERE synced = 1 AND timestamp < datetime('now', ?)"
+
+# Una conexión por hilo y por base de datos, abierta una sola vez.
+# isolation_level=None: autocommit; las escrituras múltiples usan _transaction().
+_tls = threading.local()
+
+
 def _connect(db_path):
-    conn = sqlite3.connect(db_path)
-    try:
-        conn.execute("PRAGMA journal_mode=WAL;")
-    except Exception:
-        pass
+    conns = getattr(_tls, "conns", None)
+    if conns is None:
+        conns = _tls.conns = {}
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path, isolation_level=None, cached_statements=256)
+        try:
+            # WAL habilitado (mejor para escrituras concurrentes).
+            # synchronous=NORMAL sigue siendo seguro ante caídas con WAL y evita
+            # un fsync por commit; busy_timeout espera en vez de fallar con SQLITE_BUSY.
+            conn.executescript(
+                """
+                PRAGMA journal_mode=WAL;
+                PRAGMA busy_timeout=5000;
+                PRAGMA synchronous=NORMAL;
+                PRAGMA temp_store=MEMORY;
+                PRAGMA cache_size=-20000;
+                """
+            )
+        except Exception:
+            pass
+        conns[db_path] = conn
     return conn
 
+
+@contextmanager
+def _transaction(conn: sqlite3.Connection):
+    """Agrupa varias escrituras en una sola transacción (un solo commit)."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+def optimize_local_db(db_path):
+    """Actualiza estadísticas del planificador (PRAGMA optimize); barato si no hay cambios."""
+    _connect(db_path).execute("PRAGMA optimize;")
+
+def prune_synced_events(db_path, days: int = 7) -> int:
+    """Borra eventos ya sincronizados con más de `days` días y libera páginas del archivo."""
+    conn = _connect(db_path)
+    deleted = conn.execute(_SQL_PRUNE_SYNCED, (f"-{int(days)} days",)).rowcount
+    # executescript ejecuta el pragma hasta el final (execute solo libera una página)
+    conn.executescript("PRAGMA incremental_vacuum(1000);")
+    return deleted
+
 def init_local_db(db_path):
     conn = _connect(db_path)
+    # La versión del esquema vive en PRAGMA user_version: en un arranque normal
+    # (base ya migrada) no se ejecuta ninguna introspección del esquema.
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    if version < 1:
+        _migrate_to_v1(conn)
+        conn.execute("PRAGMA user_version = 1")
+
+    if version < 2:
+        # auto_vacuum solo cambia en una base existente tras un VACUUM (una única vez)
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA user_version = 2")
+
+    if version < 3:
+        # Estadísticas completas una única vez; después las mantiene PRAGMA optimize
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA user_version = 3")
+
+
+def _migrate_to_v1(conn: sqlite3.Connection):
+    """Esquema base. Idempotente: bases creadas antes de user_version arrancan en 0."""
     c = conn.cursor()
 
     # Tabla de registros RFID leídos localmente
@@ -41,13 +138,13 @@ def init_local_db(db_path):
         """
     )
 
-    conn.commit()
-
-    # Migraciones suaves
+    # Migraciones suaves de esquemas anteriores
     _migrate_local_events_add_authorized(conn)
     _migrate_blocked_cards_add_room(conn)
 
-    conn.close()
+    # Índices: parcial para los pendientes de sincronizar (pequeño) y por sala
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_unsynced ON local_events(id) WHERE synced = 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_blocked_room ON blocked_cards(room_id)")
 
 
 def _table_has_column(conn: sqlite3.Connection, table: str, column: str) -> bool:
@@ -58,7 +155,6 @@ def _table_has_column(conn: sqlite3.Connection, table: str, column: str) -> bool
 def _migrate_local_events_add_authorized(conn: sqlite3.Connection):
     if not _table_has_column(conn, "local_events", "authorized"):
         conn.execute("ALTER TABLE local_events ADD COLUMN authorized INTEGER DEFAULT 1")
-        conn.commit()
 
 
 def _migrate_blocked_cards_add_room(conn: sqlite3.Connection):
@@ -66,144 +162,110 @@ def _migrate_blocked_cards_add_room(conn: sqlite3.Connection):
     cur = conn.execute("PRAGMA table_info(blocked_cards)")
     cols = [r[1] for r in cur.fetchall()]
     if cols and ("room_id" not in cols or "card_uid" not in cols):
-        # Renombrar y recrear
-        conn.execute("ALTER TABLE blocked_cards RENAME TO blocked_cards_old")
-        conn.execute(
-            """
-            CREATE TABLE blocked_cards (
-                card_uid TEXT NOT NULL,
-                room_id TEXT NOT NULL,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY(card_uid, room_id)
-            )
-            """
-        )
-        # Migrar filas antiguas con room por defecto
-        try:
-            for row in conn.execute("SELECT card_uid, updated_at FROM blocked_cards_old"):
-                conn.execute(
-                    "INSERT OR IGNORE INTO blocked_cards (card_uid, room_id, updated_at) VALUES (?, ?, ?)",
-                    (row[0], DEFAULT_ROOM_ID, row[1]),
+        # Renombrar y recrear (todo o nada)
+        with _transaction(conn):
+            conn.execute("ALTER TABLE blocked_cards RENAME TO blocked_cards_old")
+            conn.execute(
+                """
+                CREATE TABLE blocked_cards (
+                    card_uid TEXT NOT NULL,
+                    room_id TEXT NOT NULL,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY(card_uid, room_id)
                 )
-        except Exception:
-            pass
-        conn.execute("DROP TABLE IF EXISTS blocked_cards_old")
-        conn.commit()
+                """
+            )
+            # Migrar filas antiguas con room por defecto
+            try:
+                for row in conn.execute("SELECT card_uid, updated_at FROM blocked_cards_old"):
+                    conn.execute(
+                        "INSERT OR IGNORE INTO blocked_cards (card_uid, room_id, updated_at) VALUES (?, ?, ?)",
+                        (row[0], DEFAULT_ROOM_ID, row[1]),
+                    )
+            except Exception:
+                pass
+            conn.execute("DROP TABLE IF EXISTS blocked_cards_old")
 
-def insert_local_event(db_path, card_uid: str, authorized: bool):
+def insert_local_events_many(db_path, events):
+    """Inserta varios eventos (card_uid, authorized) en una sola transacción."""
     conn = _connect(db_path)
-    conn.execute(
-        "INSERT INTO local_events (card_uid, authorized) VALUES (?, ?)",
-        (card_uid, 1 if authorized else 0),
-    )
-    conn.commit()
-    conn.close()
+    with _transaction(conn):
+        conn.executemany(
+            _SQL_INSERT_EVENT,
+            [(card_uid, 1 if authorized else 0) for (card_uid, authorized) in events],
+        )
 
 from typing import List, Any
 
 def get_unsynced_events(db_path) -> List[Tuple[int, str, str, int]]:
     conn = _connect(db_path)
-    rows = conn.execute(
-        "SELECT id, card_uid, timestamp, authorized FROM local_events WHERE synced = 0"
-    ).fetchall()
-    conn.close()
+    rows = conn.execute(_SQL_SELECT_UNSYNCED).fetchall()
     # rows is a list of tuples already
     return [tuple(r) for r in rows]
 
 def mark_as_synced(db_path, ids):
+    # Los ids viajan como un único parámetro JSON: misma sentencia sea cual sea el lote
     conn = _connect(db_path)
-    conn.executemany("UPDATE local_events SET synced = 1 WHERE id = ?", [(i,) for i in ids])
-    conn.commit()
-    conn.close()
+    conn.execute(_SQL_MARK_SYNCED, (json.dumps(list(ids)),))
 
 
 def upsert_blocked_card(db_path, card_uid, updated_at=None, room_id: str = DEFAULT_ROOM_ID):
     """Marca una tarjeta como bloqueada localmente (upsert)."""
     conn = _connect(db_path)
-    if updated_at is None:
-        conn.execute(
-            "INSERT OR REPLACE INTO blocked_cards (card_uid, room_id, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)",
-            (card_uid, room_id),
-        )
-    else:
-        conn.execute(
-            "INSERT OR REPLACE INTO blocked_cards (card_uid, room_id, updated_at) VALUES (?, ?, ?)",
-            (card_uid, room_id, updated_at),
-        )
-    conn.commit()
-    conn.close()
+    conn.execute(_SQL_UPSERT_BLOCKED, (card_uid, room_id, updated_at))
 
 
 def remove_blocked_card(db_path, card_uid, room_id: str = DEFAULT_ROOM_ID):
     conn = _connect(db_path)
-    conn.execute(
-        "DELETE FROM blocked_cards WHERE card_uid = ? AND room_id = ?",
-        (card_uid, room_id),
-    )
-    conn.commit()
-    conn.close()
+    conn.execute(_SQL_DELETE_BLOCKED, (card_uid, room_id))
 
 
-def is_card_blocked(db_path, card_uid, room_id: str = DEFAULT_ROOM_ID) -> bool:
-    if room_id is None or room_id == "":
-        # Sin room_id asignado aún, no bloqueamos por seguridad operativa
-        return False
+def get_blocked_cards(db_path) -> List[Tuple[str, str]]:
+    """Devuelve todas las tarjetas bloqueadas como (card_uid, room_id)."""
     conn = _connect(db_path)
-    row = conn.execute(
-        "SELECT 1 FROM blocked_cards WHERE card_uid = ? AND room_id = ? LIMIT 1",
-        (card_uid, room_id),
-    ).fetchone()
-    conn.close()
-    return row is not None
+    return [tuple(r) for r in conn.execute(_SQL_SELECT_BLOCKED).fetchall()]
 
 
 def get_counts(db_path):
     conn = _connect(db_path)
-    cur = conn.cursor()
-    unsynced = cur.execute(
-        "SELECT COUNT(*) FROM local_events WHERE synced = 0"
-    ).fetchone()[0]
-    blocked = cur.execute("SELECT COUNT(*) FROM blocked_cards").fetchone()[0]
-    total_events = cur.execute("SELECT COUNT(*) FROM local_events").fetchone()[0]
-    conn.close()
+    # Una sola consulta; el conteo de pendientes usa el índice parcial idx_events_unsynced
+    unsynced, total_events, blocked = conn.execute(_SQL_COUNTS).fetchone()
     return {"unsynced": unsynced, "blocked": blocked, "total_events": total_events}
 
-def mark_event_as_invalid(db_path, event_id: int):
-    """Marca un evento como sincronizado (eliminado lógicamente) para no reintentar.
-    Se usa cuando la tarjeta no existe en rfid_cards."""
+def get_valid_unsynced_events(db_path, valid_card_uids: set) -> List[Tuple[int, str, str, int]]:
+    """Obtiene solo eventos con card_uid válido. Automáticamente limpia inválidos.
+
+    Los UIDs válidos se cargan en una tabla temporal para filtrar con un JOIN y
+    descartar los inválidos con un único UPDATE. La tabla solo se recarga si el
+    conjunto cambió desde la última llamada en esta conexión.
+    """
     conn = _connect(db_path)
-    conn.execute("UPDATE local_events SET synced = 1 WHERE id = ?", (event_id,))
-    conn.commit()
-    conn.close()
-    print(f"[DB] Evento {event_id} marcado como sincronizado (inválido)")
+    # Sin pendientes no se toma el lock de escritura que necesita el /rfid
+    if conn.execute(_SQL_HAS_UNSYNCED).fetchone() is None:
+        return []
 
-def get_valid_unsynced_events(db_path, valid_card_uids: set) -> List[Tuple[int, str, str, int]]:
-    """Obtiene solo eventos con card_uid válido. Automáticamente limpia inválidos."""
+    loaded = getattr(_tls, "valid_uids", None)
+    if loaded is None:
+        loaded = _tls.valid_uids = {}
+    valid_card_uids = frozenset(valid_card_uids)
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS valid_uids (uid TEXT PRIMARY KEY)")
+    with _transaction(conn):
+        if loaded.get(db_path) != valid_card_uids:
+            conn.execute(_SQL_RESET_VALID_UIDS)
+            conn.executemany(_SQL_INSERT_VALID_UID, [(uid,) for uid in valid_card_uids])
+        rows = conn.execute(_SQL_SELECT_VALID_UNSYNCED).fetchall()
+        # Limpiar eventos inválidos (la tarjeta no existe en rfid_cards)
+        invalid = conn.execute(_SQL_DISCARD_INVALID).rowcount
+    # Tras el COMMIT: si la transacción falló, la tabla temporal vuelve atrás
+    loaded[db_path] = valid_card_uids
+
+    if invalid:
+        print(f"[DB] {invalid} eventos marcados como sincronizados (card_uid no existe en rfid_cards)")
+    return [tuple(r) for r in rows]
+
+def apply_blocked_changes(db_path, added, removed):
+    """Aplica solo las altas y bajas de bloqueos, en una sola transacción."""
     conn = _connect(db_path)
-    rows = conn.execute(
-        "SELECT id, card_uid, timestamp, authorized FROM local_events WHERE synced = 0"
-    ).fetchall()
-    conn.close()
-    
-    valid_rows = []
-    for row in rows:
-        event_id, card_uid, timestamp, authorized = row
-        if card_uid in valid_card_uids:
-            valid_rows.append(tuple(row))
-        else:
-            # Limpiar evento inválido automáticamente
-            mark_event_as_invalid(db_path, event_id)
-            print(f"[DB] Evento {event_id} eliminado: card_uid '{card_uid}' no existe en rfid_cards")
-    
-    return valid_rows
-
-def update_blocked_cards(db_path, blocked_cards):
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM blocked_cards")
-    cur.executemany(
-        "INSERT INTO blocked_cards (card_uid, room_id) VALUES (?, ?)",
-        [(uid, room_id) for (uid, room_id) in blocked_cards],
-    )
-    conn.commit()
-    conn.close()
+    with _transaction(conn):
+        conn.executemany(_SQL_UPSERT_BLOCKED, [(uid, room_id, None) for (uid, room_id) in added])
+        conn.executemany(_SQL_DELETE_BLOCKED, list(removed))
@@ -1,27 +1,37 @@
+import orjson
 from flask import Flask, request, jsonify
 from db_local import (
-    insert_local_event,
-    is_card_blocked,
+    insert_local_events_many,
     get_counts,
 )
-from config import LOCAL_DB
-from runtime_state import get_room_id, get_device_id, snapshot
+from config import CFG
+from runtime_state import get_room_id, get_device_id, snapshot, is_blocked
 import threading
 import queue
 
-_event_queue = queue.Queue()  # desacoplar escritura inmediata
+try:
+    from worker import notify_local_events
+except ImportError:
+    notify_local_events = None
+
+_event_queue = queue.SimpleQueue()  # desacoplar escritura inmediata
+_MAX_BATCH = 256  # eventos máximos por transacción
 
 app = Flask(__name__)
 
 @app.route("/rfid", methods=["POST"])
 def receive_rfid():
-    data = request.get_json(force=True, silent=True) or {}
-    card_uid = data.get("card_uid")
+    # orjson directamente sobre el cuerpo crudo (mismo comportamiento que get_json(force, silent))
+    try:
+        data = orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        data = None
+    card_uid = data.get("card_uid") if isinstance(data, dict) else None
 
     if not card_uid:
         return jsonify({"error": "card_uid requerido"}), 400
 
-    blocked = is_card_blocked(LOCAL_DB, card_uid, get_room_id() or "")
+    blocked = is_blocked(card_uid, get_room_id())
     authorized = not blocked
 
     # siempre registramos el intento: autorizado o denegado
@@ -31,31 +41,53 @@ def receive_rfid():
 
 @app.route("/status", methods=["GET"])
 def status():
-    counts = get_counts(LOCAL_DB)
+    counts = get_counts(CFG.LOCAL_DB)
     rs = snapshot()
     return jsonify({**rs, **counts, "queue_size": _event_queue.qsize()})
 
 
 def _queue_worker():
     while True:
-        item = _event_queue.get()
+        # Bloquea hasta el primer evento y luego drena lo que ya esté en cola
+        batch = [_event_queue.get()]
         try:
-            card_uid, authorized = item
-            insert_local_event(LOCAL_DB, card_uid, authorized)
+            while len(batch) < _MAX_BATCH:
+                batch.append(_event_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        saved = _save_batch(batch)
+        for card_uid, authorized in saved:
             print(
                 f"[LOCAL SERVER] Guardado evento local: {card_uid} | authorized={authorized}"
             )
-            # 🔥 Despertar inmediatamente al worker para sincronizar
-            try:
-                from worker import realtime_event
-                realtime_event.set()
-            except ImportError:
-                pass
+        # 🔥 Despertar al worker una sola vez por lote para sincronizar
+        if saved and notify_local_events is not None:
+            notify_local_events()
+
+
+def _save_batch(batch):
+    """Guarda el lote en una transacción; si falla, reintenta evento por evento
+    para no perder todo el lote por una sola fila. Devuelve los guardados."""
+    try:
+        insert_local_events_many(CFG.LOCAL_DB, batch)
+        return batch
+    except Exception as e:
+        print(f"[LOCAL SERVER] Error guardando lote de {len(batch)} eventos, reintentando uno a uno: {e}")
+
+    saved = []
+    for event in batch:
+        try:
+            insert_local_events_many(CFG.LOCAL_DB, [event])
+            saved.append(event)
         except Exception as e:
-            print(f"[LOCAL SERVER] Error guardando evento {item}: {e}")
-        finally:
-            _event_queue.task_done()
+            print(f"[LOCAL SERVER] Error guardando evento {event}: {e}")
+    return saved
+
 
 def run_server():
     threading.Thread(target=_queue_worker, daemon=True).start()
-    app.run(host="0.0.0.0", port=5000)
+    # Servidor WSGI de producción con un pool fijo de hilos (no usar app.run:
+    # el servidor de desarrollo de Flask crea un hilo por petición)
+    from waitress import serve
+    serve(app, host="0.0.0.0", port=5000, threads=4, connection_limit=200, channel_timeout=5)
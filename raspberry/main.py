@@ -1,12 +1,15 @@
 import threading
-from db_local import init_local_db
+from db_local import init_local_db, get_blocked_cards
+from runtime_state import set_blocked
 from local_server import run_server
 from worker import run_worker
-from config import LOCAL_DB
+from config import CFG
 
 if __name__ == "__main__":
     print("🚀 Iniciando Raspberry Local Server + Worker...")
-    init_local_db(LOCAL_DB)
+    init_local_db(CFG.LOCAL_DB)
+    # Cargar en memoria los bloqueos persistidos (consultados en cada /rfid)
+    set_blocked(get_blocked_cards(CFG.LOCAL_DB))
 
     t1 = threading.Thread(target=run_server, daemon=True)
     t2 = threading.Thread(target=run_worker, daemon=True)
@@ -1,9 +1,11 @@
 import threading
-from typing import Optional
+from typing import Iterable, Optional, Set, Tuple
 
 _lock = threading.Lock()
 _device_id: Optional[str] = None
 _room_id: Optional[str] = None
+# Copia en memoria de blocked_cards: (card_uid, room_id)
+_blocked: Set[Tuple[str, str]] = set()
 
 
 def set_device(device_id: Optional[str], room_id: Optional[str]):
@@ -32,3 +34,33 @@ def get_room_id() -> Optional[str]:
 def snapshot():
     with _lock:
         return {"device_id": _device_id, "room_id": _room_id}
+
+
+def set_blocked(cards: Iterable[Tuple[str, str]]):
+    global _blocked
+    new_blocked = {(card_uid, room_id) for (card_uid, room_id) in cards}
+    with _lock:
+        _blocked = new_blocked
+
+
+def get_blocked() -> Set[Tuple[str, str]]:
+    with _lock:
+        return set(_blocked)
+
+
+def block_card(card_uid: str, room_id: str):
+    with _lock:
+        _blocked.add((card_uid, room_id))
+
+
+def unblock_card(card_uid: str, room_id: str):
+    with _lock:
+        _blocked.discard((card_uid, room_id))
+
+
+def is_blocked(card_uid: str, room_id: Optional[str]) -> bool:
+    if not room_id:
+        # Sin room_id asignado aún, no bloqueamos por seguridad operativa
+        return False
+    with _lock:
+        return (card_uid, room_id) in _blocked
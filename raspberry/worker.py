@@ -1,113 +1,189 @@
 import threading
 import time
-from supabase import create_client, Client
-from db_local import get_valid_unsynced_events, mark_as_synced, upsert_blocked_card, remove_blocked_card
-from runtime_state import set_device, get_device_id, get_room_id
-from config import (
-    SUPABASE_URL,
-    SUPABASE_KEY,
-    LOCAL_DB,
-            SYNC_INTERVAL,
-    BACKOFF_MIN,
-    BACKOFF_MAX,
-    SUPABASE_EMAIL,
-    SUPABASE_PASSWORD,
-    AUTH_REFRESH_SECONDS,
-    AUTH_REQUIRED,
-    POLL_BLOCKS_INTERVAL,
+import httpx
+import orjson
+from supabase import create_client, Client, ClientOptions
+from db_local import get_valid_unsynced_events, mark_as_synced, upsert_blocked_card, remove_blocked_card, apply_blocked_changes, optimize_local_db, prune_synced_events
+from runtime_state import set_device, get_device_id, get_room_id, get_blocked, block_card, unblock_card
+from config import CFG
+
+# Conexiones persistentes para el bucle de sync, el poller y los POST de eventos
+_http_client = httpx.Client(
+    http2=True,
+    limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+    timeout=httpx.Timeout(10.0),
+)
+supabase: Client = create_client(
+    CFG.SUPABASE_URL, CFG.SUPABASE_KEY, options=ClientOptions(httpx_client=_http_client)
 )
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# 🔥 Evento que usaremos para "reiniciar" el bucle principal
+# 🔥 Eventos que "reinician" el bucle principal. Cada origen tiene su propio
+# evento (cambio en la nube / nuevos eventos locales) y ambos activan _wakeup,
+# que es el único que espera el bucle.
 realtime_event = threading.Event()
+sync_event = threading.Event()
+_wakeup = threading.Event()
+_WAKEUP_DEBOUNCE_SECONDS = 0.1  # ventana para agrupar avisos seguidos
+
+
+def notify_cloud_change():
+    realtime_event.set()
+    _wakeup.set()
+
+
+def notify_local_events():
+    sync_event.set()
+    _wakeup.set()
+
+
+# 💾 Tarjetas válidas (rfid_cards.uid) en memoria. Se cargan al arrancar y se
+# mantienen con Realtime; solo se recargan por TTL mientras el canal no está activo.
+_valid_uids = set()
+_valid_uids_lock = threading.Lock()
+_valid_uids_refreshed_at = 0.0
+_valid_uids_live = False  # True mientras el canal Realtime de rfid_cards está suscrito
+_cache_ttl_seconds = 30  # Refrescar cada 30 segundos sin Realtime
 
-# 💾 Cache de tarjetas válidas con timestamp para evitar consultas constantes
-_valid_cards_cache = {"uids": set(), "timestamp": 0}
-_cache_ttl_seconds = 30  # Refrescar cada 30 segundos
+_SYNC_CHUNK_SIZE = 500  # eventos por petición de inserción
+_PRUNE_INTERVAL_SECONDS = 24 * 60 * 60  # purga de eventos sincronizados una vez al día
+
+# Inserción de eventos directa contra PostgREST (ruta más frecuente del worker):
+# URL y cabeceras fijas calculadas una vez; solo el Bearer se lee de la sesión.
+_ACCESS_EVENTS_URL = f"{CFG.SUPABASE_URL.rstrip('/')}/rest/v1/access_events"
+_ACCESS_EVENTS_HEADERS = {
+    "apikey": CFG.SUPABASE_KEY,
+    "Content-Type": "application/json",
+    "Prefer": "return=minimal",
+}
 
 
 def _auth_login_forever():
     """Mantiene una sesión iniciada con email/password si están configurados.
     Reintenta con backoff si hay errores. Refresca la sesión periódicamente.
     """
-    if not SUPABASE_EMAIL or not SUPABASE_PASSWORD:
+    if not CFG.SUPABASE_EMAIL or not CFG.SUPABASE_PASSWORD:
         print("[AUTH] Sin email/password. Se usará rol ANON.")
-        if AUTH_REQUIRED:
+        if CFG.AUTH_REQUIRED:
             print("[AUTH] AUTH_REQUIRED=true pero faltan credenciales -> reintentando indefinidamente.")
         else:
             return
 
-    backoff = BACKOFF_MIN
+    backoff = CFG.BACKOFF_MIN
     while True:
         try:
             print("[AUTH] Iniciando sesión con email/password...")
             supabase.auth.sign_in_with_password({
-                "email": SUPABASE_EMAIL,
-                "password": SUPABASE_PASSWORD,
+                "email": CFG.SUPABASE_EMAIL,
+                "password": CFG.SUPABASE_PASSWORD,
             })
             session = supabase.auth.get_session()
             user_id = getattr(getattr(session, "user", None), "id", None) if session else None
             print(f"[AUTH] Sesión activa. user_id={user_id}")
-            backoff = BACKOFF_MIN
+            backoff = CFG.BACKOFF_MIN
 
             # Renovación simple: re-login cada AUTH_REFRESH_SECONDS
-            time.sleep(AUTH_REFRESH_SECONDS)
+            time.sleep(CFG.AUTH_REFRESH_SECONDS)
         except Exception as e:
             print(f"[AUTH] Error de autenticación: {e}. Reintentando en {backoff}s...")
             time.sleep(backoff)
-            backoff = min(backoff * 2, BACKOFF_MAX)
+            backoff = min(backoff * 2, CFG.BACKOFF_MAX)
+
+def _fetch_sync_bundle(include_uids: bool):
+    """Obtiene en una sola petición (RPC sync_bundle) los bloqueos del salón y,
+    si include_uids, los UIDs válidos (None si no se pidieron)."""
+    res = supabase.rpc(
+        "sync_bundle", {"p_room_id": get_room_id(), "p_include_uids": include_uids}
+    ).execute()
+    data = getattr(res, "data", None) or {}
+    valid_uids = None
+    if include_uids:
+        valid_uids = {uid for uid in (data.get("valid_uids") or []) if uid}
+    blocked_cards = []
+    for r in data.get("blocks") or []:
+        try:
+            blocked_cards.append((r.get("card_uid"), r.get("room_id")))
+        except Exception:
+            continue
+    return valid_uids, blocked_cards
 
-def seed_blocked_from_cloud():
-    """Sincroniza la lista de tarjetas bloqueadas desde Supabase al almacenamiento local."""
-    print("[WORKER] Sincronizando bloqueos desde Supabase...")
-    try:
-        res = (
-            supabase.table("access_blocks")
-            .select("card_uid, room_id")
-            .eq("room_id", get_room_id())
-            .execute()
-        )
 
-        data = getattr(res, "data", []) or []
-        blocked_cards = []
-        for r in data:
-            try:
-                blocked_cards.append((r.get("card_uid"), r.get("room_id")))
-            except Exception:
-                continue
+def _valid_uids_expired() -> bool:
+    with _valid_uids_lock:
+        return not _valid_uids_live and (time.time() - _valid_uids_refreshed_at) >= _cache_ttl_seconds
 
-        from db_local import update_blocked_cards
-        update_blocked_cards(LOCAL_DB, blocked_cards)
 
-        print(f"[WORKER] {len(blocked_cards)} tarjetas bloqueadas sincronizadas.")
+def _refresh_from_cloud(include_uids: bool = False):
+    """Aplica el paquete de sincronización: bloqueos (SQLite + memoria) y, si se
+    piden, el cache de tarjetas válidas (tabla completa, solo cuando hace falta)."""
+    valid_uids, blocked_cards = _fetch_sync_bundle(include_uids)
+
+    # Solo se escriben las diferencias con lo que ya hay (memoria == SQLite);
+    # si nada cambió no se toca la base local.
+    current = get_blocked()
+    fresh = set(blocked_cards)
+    added, removed = fresh - current, current - fresh
+    if added or removed:
+        apply_blocked_changes(CFG.LOCAL_DB, added, removed)
+        for card_uid, room_id in added:
+            block_card(card_uid, room_id)
+        for card_uid, room_id in removed:
+            unblock_card(card_uid, room_id)
+        print(f"[WORKER] Bloqueos actualizados: +{len(added)} -{len(removed)}")
+
+    if valid_uids is not None:
+        _set_valid_uids(valid_uids)
+    return valid_uids, blocked_cards
+
+
+def _set_valid_uids(valid_uids):
+    global _valid_uids, _valid_uids_refreshed_at
+    with _valid_uids_lock:
+        _valid_uids = set(valid_uids)
+        _valid_uids_refreshed_at = time.time()
+
+
+def seed_blocked_from_cloud():
+    """Sincroniza desde Supabase las tarjetas bloqueadas.
+    Las tarjetas válidas solo se descargan si su cache caducó (TTL de 30 s)."""
+    print("[WORKER] Sincronizando bloqueos desde Supabase...")
+    try:
+        valid_uids, blocked_cards = _refresh_from_cloud(include_uids=_valid_uids_expired())
+        if valid_uids is None:
+            print(f"[WORKER] {len(blocked_cards)} tarjetas bloqueadas sincronizadas.")
+        else:
+            print(f"[WORKER] {len(blocked_cards)} tarjetas bloqueadas sincronizadas, {len(valid_uids)} tarjetas válidas.")
     except Exception as e:
         print(f"[WORKER] Error al sincronizar bloqueos: {e}")
 
 
 def _get_valid_card_uids():
-    """Obtiene la lista de card_uid válidos de Supabase (rfid_cards) con cache."""
-    current_time = time.time()
-    
-    # Si el cache es válido, devolver el cache
-    if (current_time - _valid_cards_cache["timestamp"]) < _cache_ttl_seconds:
-        return _valid_cards_cache["uids"]
-    
+    """Devuelve los card_uid válidos (rfid_cards); consulta Supabase solo si el cache caducó sin Realtime."""
+    if not _valid_uids_expired():
+        with _valid_uids_lock:
+            return set(_valid_uids)
+
     try:
-        res = supabase.table("rfid_cards").select("uid").execute()
-        data = getattr(res, "data", []) or []
-        valid_uids = {row.get("uid") for row in data if row.get("uid")}
-        
-        # Actualizar cache
-        _valid_cards_cache["uids"] = valid_uids
-        _valid_cards_cache["timestamp"] = current_time
-        
+        # La misma petición trae también los bloqueos: se aplican de paso
+        valid_uids, _ = _refresh_from_cloud(include_uids=True)
         print(f"[WORKER] Cache actualizado: {len(valid_uids)} tarjetas válidas")
         return valid_uids
     except Exception as e:
         print(f"[WORKER] Error obteniendo tarjetas válidas, usando cache anterior: {e}")
         # Si hay error, devolver el cache anterior aunque esté expirado
-        return _valid_cards_cache["uids"]
+        with _valid_uids_lock:
+            return set(_valid_uids)
+
+
+def _insert_access_events(payload):
+    """POST de un lote a /rest/v1/access_events con el pool httpx compartido."""
+    session = supabase.auth.get_session()
+    token = getattr(session, "access_token", None) or CFG.SUPABASE_KEY
+    response = _http_client.post(
+        _ACCESS_EVENTS_URL,
+        headers={**_ACCESS_EVENTS_HEADERS, "Authorization": f"Bearer {token}"},
+        content=orjson.dumps(payload),
+    )
+    response.raise_for_status()
 
 
 def sync_with_supabase():
@@ -115,33 +191,37 @@ def sync_with_supabase():
     valid_card_uids = _get_valid_card_uids()
     
     # Obtener eventos válidos (se eliminan automáticamente los inválidos)
-    events = get_valid_unsynced_events(LOCAL_DB, valid_card_uids)
+    events = get_valid_unsynced_events(CFG.LOCAL_DB, valid_card_uids)
     if not events:
         print("[WORKER] No hay eventos pendientes.")
         return True
 
     print(f"[WORKER] Subiendo {len(events)} eventos a Supabase...")
 
-    payload = []
-    ids = []
-    for (event_id, card_uid, timestamp, authorized) in events:
-        payload.append({
-            "card_uid": card_uid,
-            "raspberry_id": get_device_id(),
-            "room_id": get_room_id(),
-            "event_time": timestamp,
-            "authorized": bool(authorized),
-        })
-        ids.append(event_id)
+    device_id = get_device_id()
+    room_id = get_room_id()
+    for start in range(0, len(events), _SYNC_CHUNK_SIZE):
+        chunk = events[start:start + _SYNC_CHUNK_SIZE]
+        payload = [
+            {
+                "card_uid": card_uid,
+                "raspberry_id": device_id,
+                "room_id": room_id,
+                "event_time": timestamp,
+                "authorized": bool(authorized),
+            }
+            for (_, card_uid, timestamp, authorized) in chunk
+        ]
+        try:
+            _insert_access_events(payload)
+        except Exception as e:
+            # Los lotes anteriores ya quedaron marcados; este y los siguientes se reintentan
+            print(f"[WORKER] Error al sincronizar lote: {e}")
+            return False
+        mark_as_synced(CFG.LOCAL_DB, [event[0] for event in chunk])
 
-    try:
-        supabase.table("access_events").insert(payload).execute()
-        mark_as_synced(LOCAL_DB, ids)
-        print("[WORKER] Sincronización OK.")
-        return True
-    except Exception as e:
-        print(f"[WORKER] Error al sincronizar lote: {e}")
-        return False
+    print("[WORKER] Sincronización OK.")
+    return True
 
 
 def _handle_permission_change(payload):
@@ -154,22 +234,64 @@ def _handle_permission_change(payload):
             card_uid = new.get("card_uid")
             room_id = new.get("room_id") or get_room_id() or ""
             if card_uid:
-                upsert_blocked_card(LOCAL_DB, card_uid, new.get("created_at"), room_id)
+                upsert_blocked_card(CFG.LOCAL_DB, card_uid, new.get("created_at"), room_id)
+                block_card(card_uid, room_id)
                 print(f"[WORKER][RT] Bloqueada: {card_uid} room={room_id}")
         elif event_type == "DELETE":
             card_uid = old.get("card_uid")
             room_id = old.get("room_id") or get_room_id() or ""
             if card_uid:
-                remove_blocked_card(LOCAL_DB, card_uid, room_id)
+                remove_blocked_card(CFG.LOCAL_DB, card_uid, room_id)
+                unblock_card(card_uid, room_id)
                 print(f"[WORKER][RT] Desbloqueada: {card_uid} room={room_id}")
 
         # 🔔 Cuando llega un cambio Realtime, despertamos el bucle principal
-        realtime_event.set()
+        notify_cloud_change()
 
     except Exception as e:
         print(f"[WORKER][RT] Error manejando cambio: {e}")
 
 
+def _handle_card_change(payload):
+    """Mantiene el set de tarjetas válidas con los cambios Realtime de rfid_cards."""
+    try:
+        event_type = payload.get("eventType") or payload.get("type")
+        new = payload.get("new", {}) or {}
+        old = payload.get("old", {}) or {}
+
+        with _valid_uids_lock:
+            if event_type in ("INSERT", "UPDATE"):
+                if old.get("uid") and old.get("uid") != new.get("uid"):
+                    _valid_uids.discard(old.get("uid"))
+                if new.get("uid"):
+                    _valid_uids.add(new.get("uid"))
+            elif event_type == "DELETE" and old.get("uid"):
+                _valid_uids.discard(old.get("uid"))
+        print(f"[WORKER][RT] rfid_cards {event_type}: {new.get('uid') or old.get('uid')}")
+    except Exception as e:
+        print(f"[WORKER][RT] Error manejando cambio de tarjeta: {e}")
+
+
+def _on_cards_channel_state(status, err=None):
+    """Activa el modo Realtime de tarjetas válidas o vuelve al refresco por TTL si el canal cae."""
+    global _valid_uids_live
+    state = getattr(status, "value", status)
+    if state == "SUBSCRIBED":
+        # Recargar una vez para no perder cambios ocurridos sin canal. Solo con la
+        # recarga completa se desactiva el TTL: si falla, el set puede estar vacío
+        # o desfasado y get_valid_unsynced_events descartaría eventos válidos.
+        try:
+            _refresh_from_cloud(include_uids=True)
+        except Exception as e:
+            print(f"[WORKER][RT] Error recargando tarjetas válidas: {e} (refresco por TTL)")
+            return
+        _valid_uids_live = True
+        print("[WORKER] Suscrito a Realtime de rfid_cards")
+    else:
+        _valid_uids_live = False
+        print(f"[WORKER][RT] Canal rfid_cards {state}: {err or ''} (refresco por TTL)")
+
+
 def start_realtime_listener():
     try:
         channel = supabase.channel("access_blocks_changes")
@@ -180,13 +302,21 @@ def start_realtime_listener():
         )
         channel.subscribe()  # type: ignore[attr-defined]
         print("[WORKER] Suscrito a Realtime de access_blocks")
+
+        cards_channel = supabase.channel("rfid_cards_changes")
+        cards_channel.on(  # type: ignore[attr-defined]
+            "postgres_changes",
+            {"event": "*", "schema": "public", "table": "rfid_cards"},
+            _handle_card_change,
+        )
+        cards_channel.subscribe(_on_cards_channel_state)  # type: ignore[attr-defined]
     except Exception as e:
         msg = str(e)
         print(f"[WORKER] Error suscribiendo Realtime: {msg}")
         # Fallback: si el cliente sync no soporta Realtime, arrancamos un poller
         if "sync client" in msg.lower() or "async client" in msg.lower():
             print("[WORKER] Realtime no disponible en cliente sync: arrancando polling de access_blocks como fallback.")
-            threading.Thread(target=_poll_blocked_worker, args=(POLL_BLOCKS_INTERVAL,), daemon=True).start()
+            threading.Thread(target=_poll_blocked_worker, args=(CFG.POLL_BLOCKS_INTERVAL,), daemon=True).start()
         else:
             # En otros errores reintentamos el subscriber más tarde
             print("[WORKER] Error desconocido en Realtime, reintentando en background.")
@@ -195,21 +325,40 @@ def start_realtime_listener():
 
 def _poll_blocked_worker(interval: int):
     """Polling simple: refresca la lista de access_blocks periódicamente.
-    Llama a seed_blocked_from_cloud() y despierta el bucle principal con realtime_event.
+    Llama a seed_blocked_from_cloud() y despierta el bucle principal con notify_cloud_change().
     """
     print(f"[POLL] Arrancando poller de access_blocks cada {interval}s")
     while True:
         try:
             seed_blocked_from_cloud()
             # Notificar al bucle principal para re-evaluar inmediatamente
-            realtime_event.set()
+            notify_cloud_change()
         except Exception as e:
             print(f"[POLL] Error refrescando bloqueos: {e}")
         time.sleep(interval)
 
 
+def _maintenance_worker(interval: int):
+    """Mantenimiento periódico de la base local."""
+    last_prune = 0.0
+    while True:
+        time.sleep(interval)
+        try:
+            optimize_local_db(CFG.LOCAL_DB)
+        except Exception as e:
+            print(f"[MAINT] Error optimizando base local: {e}")
+
+        if time.time() - last_prune >= _PRUNE_INTERVAL_SECONDS:
+            try:
+                deleted = prune_synced_events(CFG.LOCAL_DB, CFG.LOCAL_EVENTS_RETENTION_DAYS)
+                print(f"[MAINT] {deleted} eventos sincronizados purgados")
+                last_prune = time.time()
+            except Exception as e:
+                print(f"[MAINT] Error purgando eventos: {e}")
+
+
 def _retry_realtime_subscribe_backoff():
-    backoff = BACKOFF_MIN
+    backoff = CFG.BACKOFF_MIN
     while True:
         try:
             print(f"[RT-RETRY] Reintentando suscribirse a Realtime en {backoff}s...")
@@ -219,7 +368,7 @@ def _retry_realtime_subscribe_backoff():
         except Exception as e:
             print(f"[RT-RETRY] Error reintentando Realtime: {e}")
             time.sleep(backoff)
-            backoff = min(backoff * 2, BACKOFF_MAX)
+            backoff = min(backoff * 2, CFG.BACKOFF_MAX)
 
 
 def _discover_or_register_device():
@@ -231,7 +380,7 @@ def _discover_or_register_device():
     - No crea filas desde la Raspberry. Espera que un administrador cree/asigne la fila.
     - Reintenta con backoff hasta que encuentre una fila con room_id.
     """
-    backoff = BACKOFF_MIN
+    backoff = CFG.BACKOFF_MIN
     while True:
         try:
             session = supabase.auth.get_session()
@@ -258,28 +407,28 @@ def _discover_or_register_device():
                     print(f"[DISCOVERY] No hay dispositivo registrado para user_id={user_id}. Esperando que un admin registre la fila en raspberry_devices.")
 
             time.sleep(backoff)
-            backoff = min(backoff * 2, BACKOFF_MAX)
+            backoff = min(backoff * 2, CFG.BACKOFF_MAX)
         except Exception as e:
             print(f"[DISCOVERY] Error: {e}")
             time.sleep(backoff)
-            backoff = min(backoff * 2, BACKOFF_MAX)
+            backoff = min(backoff * 2, CFG.BACKOFF_MAX)
 
 
 def run_worker():
     # Autenticación bloqueante si AUTH_REQUIRED, de lo contrario hilo en background
-    if AUTH_REQUIRED:
+    if CFG.AUTH_REQUIRED:
         print("[WORKER] AUTH_REQUIRED=true: esperando sesión antes de continuar...")
         # Intento inicial síncrono (reusa la función con un ciclo único)
         attempt = 1
         while True:
             try:
-                if not SUPABASE_EMAIL or not SUPABASE_PASSWORD:
+                if not CFG.SUPABASE_EMAIL or not CFG.SUPABASE_PASSWORD:
                     print("[WORKER] Credenciales faltantes. Define SUPABASE_EMAIL y SUPABASE_PASSWORD.")
-                    time.sleep(BACKOFF_MIN)
+                    time.sleep(CFG.BACKOFF_MIN)
                     continue
                 supabase.auth.sign_in_with_password({
-                    "email": SUPABASE_EMAIL,
-                    "password": SUPABASE_PASSWORD,
+                    "email": CFG.SUPABASE_EMAIL,
+                    "password": CFG.SUPABASE_PASSWORD,
                 })
                 session = supabase.auth.get_session()
                 if session and session.user:
@@ -290,7 +439,7 @@ def run_worker():
             except Exception as e:
                 print(f"[WORKER] Error login inicial ({attempt}): {e}")
             attempt += 1
-            time.sleep(min(BACKOFF_MIN * attempt, BACKOFF_MAX))
+            time.sleep(min(CFG.BACKOFF_MIN * attempt, CFG.BACKOFF_MAX))
         # Arranca refresco en background
         threading.Thread(target=_auth_login_forever, daemon=True).start()
     else:
@@ -306,32 +455,40 @@ def run_worker():
 
     seed_blocked_from_cloud()
     threading.Thread(target=start_realtime_listener, daemon=True).start()
+    threading.Thread(target=_maintenance_worker, args=(CFG.DB_MAINTENANCE_INTERVAL,), daemon=True).start()
 
-    backoff = BACKOFF_MIN
+    backoff = CFG.BACKOFF_MIN
     while True:
         try:
             ok = sync_with_supabase()
             if ok:
-                backoff = BACKOFF_MIN
+                backoff = CFG.BACKOFF_MIN
             else:
                 time.sleep(backoff)
-                backoff = min(backoff * 2, BACKOFF_MAX)
+                backoff = min(backoff * 2, CFG.BACKOFF_MAX)
 
-            # 💤 Esperar el próximo ciclo o un cambio Realtime
+            # 💤 Esperar el próximo ciclo, nuevos eventos locales o un cambio Realtime
             # Si hay eventos pendientes, usar timeout corto (0.5s) para sincronizar rápidamente
             from db_local import get_unsynced_events
-            pending = len(get_unsynced_events(LOCAL_DB)) > 0
-            timeout = 0.5 if pending else SYNC_INTERVAL
+            pending = len(get_unsynced_events(CFG.LOCAL_DB)) > 0
+            timeout = 0.5 if pending else CFG.SYNC_INTERVAL
             
             print(f"[WORKER] Esperando {timeout}s (eventos pendientes: {pending})...")
-            realtime_event.wait(timeout=timeout)
-
-            # Si el evento fue activado, lo limpiamos para la siguiente espera
+            if _wakeup.wait(timeout=timeout):
+                # Debounce: una ráfaga de avisos (p. ej. cambios masivos de bloqueos)
+                # se agrupa en un único ciclo de sincronización
+                time.sleep(_WAKEUP_DEBOUNCE_SECONDS)
+            # Limpiar antes de revisar el origen: un aviso posterior vuelve a activarlo
+            _wakeup.clear()
+
+            if sync_event.is_set():
+                sync_event.clear()
+                print("[WORKER] 🔄 Sincronización inmediata por nuevos eventos locales.")
             if realtime_event.is_set():
-                print("[WORKER] 🔄 Sincronización inmediata por nuevo evento.")
                 realtime_event.clear()
+                print("[WORKER] 🔄 Sincronización inmediata por cambio en la nube.")
 
         except Exception as e:
             print(f"[WORKER] Error general: {e}")
             time.sleep(backoff)
-            backoff = min(backoff * 2, BACKOFF_MAX)
+            backoff = min(backoff * 2, CFG.BACKOFF_MAX)
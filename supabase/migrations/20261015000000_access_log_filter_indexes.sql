@@ -0,0 +1,8 @@
+-- Índices para los filtros del dashboard, que ahora se resuelven en Postgres
+-- (PostgREST) en lugar de filtrar en memoria en Flask.
+
+-- Búsquedas ilike '%term%' (índices trigram sobre access_events)
+CREATE EXTENSION IF NOT EXISTS "pg_trgm" WITH SCHEMA "extensions";
+
+-- Propagación del nombre del salón a sus eventos (WHERE room_id = ...)
+CREATE INDEX IF NOT EXISTS "idx_access_events_room_id" ON "public"."access_events" USING "btree" ("room_id");
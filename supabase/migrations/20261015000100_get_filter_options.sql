@@ -0,0 +1,40 @@
+-- Opciones del buscador del dashboard (nombres, códigos y UIDs distintos),
+-- calculadas en Postgres para no descargar toda la tabla rfid_cards.
+
+CREATE OR REPLACE FUNCTION "public"."get_filter_options"() RETURNS json
+    LANGUAGE "sql" STABLE
+    AS $$
+  WITH "names" AS (
+    SELECT DISTINCT btrim("person_name") AS "value"
+    FROM "public"."rfid_cards"
+    WHERE btrim(coalesce("person_name", '')) <> ''
+  ), "codes" AS (
+    SELECT DISTINCT btrim("student_code") AS "value"
+    FROM "public"."rfid_cards"
+    WHERE btrim(coalesce("student_code", '')) <> ''
+  ), "uids" AS (
+    SELECT DISTINCT btrim("uid") AS "value"
+    FROM "public"."rfid_cards"
+    WHERE btrim("uid") <> ''
+  ), "all_students" AS (
+    SELECT "value" FROM "names"
+    UNION
+    SELECT "value" FROM "codes"
+    UNION
+    SELECT "value" FROM "uids"
+  )
+  SELECT json_build_object(
+    'students', COALESCE((SELECT json_agg("value" ORDER BY lower("value")) FROM "all_students"), '[]'::json),
+    'students_by_name', COALESCE((SELECT json_agg("value" ORDER BY lower("value")) FROM "names"), '[]'::json),
+    'students_by_code', COALESCE((SELECT json_agg("value" ORDER BY lower("value")) FROM "codes"), '[]'::json),
+    'students_by_uid', COALESCE((SELECT json_agg("value" ORDER BY lower("value")) FROM "uids"), '[]'::json)
+  );
+$$;
+
+
+ALTER FUNCTION "public"."get_filter_options"() OWNER TO "postgres";
+
+
+GRANT ALL ON FUNCTION "public"."get_filter_options"() TO "anon";
+GRANT ALL ON FUNCTION "public"."get_filter_options"() TO "authenticated";
+GRANT ALL ON FUNCTION "public"."get_filter_options"() TO "service_role";
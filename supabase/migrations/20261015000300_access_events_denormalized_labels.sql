@@ -0,0 +1,157 @@
+-- Copia en access_events los datos que muestra el dashboard (estudiante,
+-- salón y edificio) para que el listado de accesos no necesite joins.
+-- Los eventos se escriben una sola vez y se leen en cada carga del dashboard.
+
+ALTER TABLE "public"."access_events"
+    ADD COLUMN IF NOT EXISTS "person_name" "text",
+    ADD COLUMN IF NOT EXISTS "student_code" "text",
+    ADD COLUMN IF NOT EXISTS "room_name" "text",
+    ADD COLUMN IF NOT EXISTS "building_name" "text";
+
+
+-- Rellena las columnas al insertar (o al cambiar la tarjeta / sala del evento)
+CREATE OR REPLACE FUNCTION "public"."fill_access_event_labels"() RETURNS "trigger"
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+BEGIN
+  SELECT c.person_name, c.student_code
+    INTO NEW.person_name, NEW.student_code
+    FROM public.rfid_cards c
+   WHERE c.uid = NEW.card_uid;
+
+  SELECT r.name, b.name
+    INTO NEW.room_name, NEW.building_name
+    FROM public.rooms r
+    LEFT JOIN public.buildings b ON b.id = r.building_id
+   WHERE r.id = NEW.room_id;
+
+  RETURN NEW;
+END;
+$$;
+
+
+ALTER FUNCTION "public"."fill_access_event_labels"() OWNER TO "postgres";
+
+
+CREATE OR REPLACE TRIGGER "access_events_fill_labels"
+    BEFORE INSERT OR UPDATE OF "card_uid", "room_id" ON "public"."access_events"
+    FOR EACH ROW EXECUTE FUNCTION "public"."fill_access_event_labels"();
+
+
+-- Propaga los cambios de nombre a los eventos ya registrados
+CREATE OR REPLACE FUNCTION "public"."sync_access_event_card_labels"() RETURNS "trigger"
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+BEGIN
+  UPDATE public.access_events
+     SET person_name = NEW.person_name,
+         student_code = NEW.student_code
+   WHERE card_uid = NEW.uid;
+  RETURN NULL;
+END;
+$$;
+
+
+ALTER FUNCTION "public"."sync_access_event_card_labels"() OWNER TO "postgres";
+
+
+CREATE OR REPLACE TRIGGER "rfid_cards_sync_event_labels"
+    AFTER UPDATE OF "person_name", "student_code" ON "public"."rfid_cards"
+    FOR EACH ROW
+    WHEN ((OLD."person_name" IS DISTINCT FROM NEW."person_name") OR (OLD."student_code" IS DISTINCT FROM NEW."student_code"))
+    EXECUTE FUNCTION "public"."sync_access_event_card_labels"();
+
+
+CREATE OR REPLACE FUNCTION "public"."sync_access_event_room_labels"() RETURNS "trigger"
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+BEGIN
+  UPDATE public.access_events
+     SET room_name = NEW.name,
+         building_name = (SELECT b.name FROM public.buildings b WHERE b.id = NEW.building_id)
+   WHERE room_id = NEW.id;
+  RETURN NULL;
+END;
+$$;
+
+
+ALTER FUNCTION "public"."sync_access_event_room_labels"() OWNER TO "postgres";
+
+
+CREATE OR REPLACE TRIGGER "rooms_sync_event_labels"
+    AFTER UPDATE OF "name", "building_id" ON "public"."rooms"
+    FOR EACH ROW
+    WHEN ((OLD."name" IS DISTINCT FROM NEW."name") OR (OLD."building_id" IS DISTINCT FROM NEW."building_id"))
+    EXECUTE FUNCTION "public"."sync_access_event_room_labels"();
+
+
+CREATE OR REPLACE FUNCTION "public"."sync_access_event_building_labels"() RETURNS "trigger"
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+BEGIN
+  UPDATE public.access_events e
+     SET building_name = NEW.name
+    FROM public.rooms r
+   WHERE r.building_id = NEW.id
+     AND e.room_id = r.id;
+  RETURN NULL;
+END;
+$$;
+
+
+ALTER FUNCTION "public"."sync_access_event_building_labels"() OWNER TO "postgres";
+
+
+CREATE OR REPLACE TRIGGER "buildings_sync_event_labels"
+    AFTER UPDATE OF "name" ON "public"."buildings"
+    FOR EACH ROW
+    WHEN (OLD."name" IS DISTINCT FROM NEW."name")
+    EXECUTE FUNCTION "public"."sync_access_event_building_labels"();
+
+
+-- Backfill de los eventos existentes
+UPDATE "public"."access_events" e
+   SET "person_name" = c."person_name",
+       "student_code" = c."student_code"
+  FROM "public"."rfid_cards" c
+ WHERE c."uid" = e."card_uid";
+
+UPDATE "public"."access_events" e
+   SET "room_name" = r."name",
+       "building_name" = b."name"
+  FROM "public"."rooms" r
+  LEFT JOIN "public"."buildings" b ON b."id" = r."building_id"
+ WHERE r."id" = e."room_id";
+
+
+-- Índices para los filtros del dashboard sobre las columnas copiadas
+CREATE INDEX IF NOT EXISTS "idx_access_events_room_name" ON "public"."access_events" USING "btree" ("room_name");
+
+CREATE INDEX IF NOT EXISTS "idx_access_events_building_name" ON "public"."access_events" USING "btree" ("building_name");
+
+CREATE INDEX IF NOT EXISTS "idx_access_events_person_name_trgm" ON "public"."access_events" USING "gin" ("person_name" "extensions"."gin_trgm_ops");
+
+CREATE INDEX IF NOT EXISTS "idx_access_events_student_code_trgm" ON "public"."access_events" USING "gin" ("student_code" "extensions"."gin_trgm_ops");
+
+CREATE INDEX IF NOT EXISTS "idx_access_events_card_uid_trgm" ON "public"."access_events" USING "gin" ("card_uid" "extensions"."gin_trgm_ops");
+
+
+GRANT ALL ON FUNCTION "public"."fill_access_event_labels"() TO "anon";
+GRANT ALL ON FUNCTION "public"."fill_access_event_labels"() TO "authenticated";
+GRANT ALL ON FUNCTION "public"."fill_access_event_labels"() TO "service_role";
+
+GRANT ALL ON FUNCTION "public"."sync_access_event_card_labels"() TO "anon";
+GRANT ALL ON FUNCTION "public"."sync_access_event_card_labels"() TO "authenticated";
+GRANT ALL ON FUNCTION "public"."sync_access_event_card_labels"() TO "service_role";
+
+GRANT ALL ON FUNCTION "public"."sync_access_event_room_labels"() TO "anon";
+GRANT ALL ON FUNCTION "public"."sync_access_event_room_labels"() TO "authenticated";
+GRANT ALL ON FUNCTION "public"."sync_access_event_room_labels"() TO "service_role";
+
+GRANT ALL ON FUNCTION "public"."sync_access_event_building_labels"() TO "anon";
+GRANT ALL ON FUNCTION "public"."sync_access_event_building_labels"() TO "authenticated";
+GRANT ALL ON FUNCTION "public"."sync_access_event_building_labels"() TO "service_role";
@@ -0,0 +1,7 @@
+-- El dashboard siempre ordena por event_time DESC y pagina con offset/limit:
+-- con estos índices el orden sale de un index scan en lugar de un sort.
+
+CREATE INDEX IF NOT EXISTS "idx_access_events_event_time_desc" ON "public"."access_events" USING "btree" ("event_time" DESC);
+
+-- Historial de una tarjeta (búsqueda por UID / usuario y "Mi perfil")
+CREATE INDEX IF NOT EXISTS "idx_access_events_card_uid_event_time" ON "public"."access_events" USING "btree" ("card_uid", "event_time" DESC);
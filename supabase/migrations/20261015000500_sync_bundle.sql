@@ -0,0 +1,27 @@
+-- Datos que la Raspberry necesita en cada sincronización, en una sola petición:
+-- UIDs de tarjetas registradas y bloqueos vigentes de su salón.
+-- Los UIDs son la tabla completa: solo se incluyen si p_include_uids es true
+-- (la Raspberry los pide cuando caduca su cache; si no, valid_uids es null).
+
+CREATE OR REPLACE FUNCTION "public"."sync_bundle"("p_room_id" "uuid", "p_include_uids" boolean DEFAULT true) RETURNS json
+    LANGUAGE "sql" STABLE
+    AS $$
+  SELECT json_build_object(
+    'valid_uids', CASE WHEN "p_include_uids" THEN
+      COALESCE((SELECT json_agg("uid") FROM "public"."rfid_cards"), '[]'::json)
+    END,
+    'blocks', COALESCE((
+      SELECT json_agg(json_build_object('card_uid', "card_uid", 'room_id', "room_id"))
+      FROM "public"."access_blocks"
+      WHERE "room_id" = "p_room_id"
+    ), '[]'::json)
+  );
+$$;
+
+
+ALTER FUNCTION "public"."sync_bundle"("p_room_id" "uuid", "p_include_uids" boolean) OWNER TO "postgres";
+
+
+GRANT ALL ON FUNCTION "public"."sync_bundle"("p_room_id" "uuid", "p_include_uids" boolean) TO "anon";
+GRANT ALL ON FUNCTION "public"."sync_bundle"("p_room_id" "uuid", "p_include_uids" boolean) TO "authenticated";
+GRANT ALL ON FUNCTION "public"."sync_bundle"("p_room_id" "uuid", "p_include_uids" boolean) TO "service_role";
@@ -0,0 +1,4 @@
+-- La Raspberry mantiene en memoria los UIDs registrados y los actualiza con los
+-- cambios de rfid_cards vía Realtime, en vez de descargar la tabla completa.
+
+ALTER PUBLICATION "supabase_realtime" ADD TABLE ONLY "public"."rfid_cards";